@@ -0,0 +1,210 @@
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from simulation.balances import block_delta
+from simulation.block import Block
+from simulation.blockstore import BlockStore
+from simulation.event import Event, EventQueue, RECEIVE_TXN
+from simulation.link import LinkTable
+from simulation.mining import MODES, PEER, ORACLE
+from simulation.network import Network
+from simulation.peer import Peer
+from simulation.simulator import Simulator
+from simulation.transaction import Transaction
+
+
+def bench_events(n, Ttx, I, max_time, seed, mining=PEER):
+    """
+    Runs the event loop of a full simulation and reports how many
+    events per second it processes.
+    """
+    random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        network = Network(n, 0, 0, I)
+        simulator = Simulator(network, Ttx, I, max_time, mining=mining)
+        simulator.initialize_events()
+
+        start = time.perf_counter()
+        simulator.process_events()
+        elapsed = time.perf_counter() - start
+
+    events = simulator.events_processed
+    return events, elapsed, events / elapsed
+
+
+def compare_mining(n=40, z1=50, I=100, max_time=50000, seeds=range(5)):
+    """
+    Runs the same configurations with per-peer mining timers and with the
+    mining oracle, and returns per mode the mean block interval, the share
+    of blocks mined by low CPU peers and the share of blocks that end up
+    in the longest chain.
+    """
+    results = {}
+    for mining in MODES:
+        mined = low_cpu = in_chain = 0
+        for seed in seeds:
+            random.seed(seed)
+            network = Network(n, 0, z1, I)
+            simulator = Simulator(network, 1e9, I, max_time, mining=mining)
+            simulator.initialize_events()
+            simulator.process_events()
+
+            mined += sum(p.total_blocks_mined for p in network.peers)
+            low_cpu += sum(p.total_blocks_mined for p in network.peers if p.is_low_cpu)
+            in_chain += sum(simulator.get_longest_chain_blocks().values())
+        results[mining] = (max_time * len(seeds) / mined, low_cpu / mined, in_chain / mined)
+    return results
+
+
+STARTUP_SCRIPT = """
+from simulation.network import Network
+from simulation.simulator import Simulator
+network = Network(50, 0, 0, 600)
+simulator = Simulator(network, 100, 600, 0)
+simulator.initialize_events()
+"""
+
+
+def bench_startup(repeats=5):
+    """
+    Measures the wall time a fresh interpreter needs to import the
+    simulator and build a network up to the first event, and the time of
+    a bare interpreter for reference. Returns the medians in seconds.
+    """
+    def median_time(args):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + args, check=True)
+            times.append(time.perf_counter() - start)
+        return statistics.median(times)
+
+    return median_time(['-c', STARTUP_SCRIPT]), median_time(['-c', 'pass'])
+
+
+def bench_queue_memory(num_events):
+    """
+    Measures the heap memory held per queued event.
+    """
+    event_queue = EventQueue()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(num_events):
+        event_queue.add_event(Event(random.random(), RECEIVE_TXN, i % 100, None))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / num_events
+
+
+def check_link_delays(samples=100000, seed=1):
+    """
+    Compares the batched queuing delays of a LinkTable with delays drawn
+    one by one from random.expovariate, as the links did before, for a
+    fast and a slow link. Returns (c, two-sample KS statistic, critical
+    value at the 1% level, relative difference of the means) per link.
+    """
+    random.seed(seed)
+    capacities = [100e6, 5e6]
+    table = LinkTable([0, 1], [1, 0], [0.1, 0.1], capacities, seed=seed)
+
+    results = []
+    for edge, c in enumerate(capacities):
+        batched = np.sort([table.queuing_delay(edge) for _ in range(samples)])
+        reference = np.sort([random.expovariate(c / 96000) for _ in range(samples)])
+
+        # Largest gap between the two empirical CDFs
+        points = np.concatenate([batched, reference])
+        gap = np.abs(np.searchsorted(batched, points, side='right')
+                     - np.searchsorted(reference, points, side='right')) / samples
+        critical = 1.628 * np.sqrt(2 / samples)
+        mean_error = abs(batched.mean() - reference.mean()) / reference.mean()
+        results.append((c, gap.max(), critical, mean_error))
+    return results
+
+
+def bench_reorg(height, num_peers=100, txns_per_block=50, reorgs=200):
+    """
+    Builds a chain of the given height on one peer, then measures the
+    average cost of a reorg that replaces the tip with a two-block branch
+    forking off its parent.
+    """
+    block_store = BlockStore()
+    peer = Peer(is_low_cpu=False, is_slow=False, I=600, peer_id=0, link_params={},
+                num_peers=num_peers, block_store=block_store)
+
+    def add_block(prev_id):
+        miner = random.randrange(num_peers)
+        txns = [Transaction(miner, miner, 50, coinbase=True)]
+        txns += [Transaction(random.randrange(num_peers), random.randrange(num_peers), 1)
+                 for _ in range(txns_per_block)]
+        block = Block(prev_id, txns, miner)
+        block_id = block_store.add(block)
+        peer.block_view.add(block_id, 0)
+        peer.balance_store.add_block(block_id, block_delta(block))
+        return block_id
+
+    tip = block_store.genesis.id
+    for _ in range(height):
+        tip = add_block(tip)
+        peer.update_canonical_chain(tip)
+
+    elapsed = 0
+    for _ in range(reorgs):
+        fork_point = block_store.parent[peer.longest_chain_tip.id]
+        new_tip = add_block(add_block(fork_point))
+
+        start = time.perf_counter()
+        peer.update_canonical_chain(new_tip)
+        elapsed += time.perf_counter() - start
+    return elapsed / reorgs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=50, help='Number of peers')
+    parser.add_argument('--Ttx', type=float, default=10, help='Mean transaction interarrival time')
+    parser.add_argument('--I', type=float, default=600, help='Mean block interarrival time')
+    parser.add_argument('--max-time', type=float, default=5000, help='Simulated time to run for')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    events, elapsed, rate = bench_events(args.n, args.Ttx, args.I, args.max_time, args.seed)
+    print(f"Event loop: {events} events in {elapsed:.2f}s ({rate:,.0f} events/s)")
+
+    events, elapsed, rate = bench_events(args.n, args.Ttx, args.I, args.max_time, args.seed, ORACLE)
+    print(f"Event loop with the mining oracle: {events} events in {elapsed:.2f}s ({rate:,.0f} events/s)")
+
+    for mining, (interval, low_cpu, in_chain) in compare_mining().items():
+        print(f"Mining ({mining}): {interval:.1f}s per block, {low_cpu:.1%} by low CPU peers, "
+              f"{in_chain:.1%} in the longest chain")
+
+    failed = False
+    for c, statistic, critical, mean_error in check_link_delays():
+        verdict = "ok" if statistic < critical else "MISMATCH"
+        failed |= statistic >= critical
+        print(f"Link delays at c={c:.0e}: KS {statistic:.4f} (critical {critical:.4f}, {verdict}), "
+              f"mean off by {mean_error:.2%}")
+
+    startup, interpreter = bench_startup()
+    print(f"Startup: {startup * 1e3:.0f} ms to the first event ({interpreter * 1e3:.0f} ms bare interpreter)")
+
+    per_event = bench_queue_memory(100000)
+    print(f"Event queue: {per_event:.0f} bytes per queued event")
+
+    for height in (100, 1000, 10000):
+        cost = bench_reorg(height)
+        print(f"Reorg at height {height}: {cost * 1e6:.0f} us per tip switch")
+
+    # The link delay check is a distribution test: a mismatch fails the run
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
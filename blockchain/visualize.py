@@ -1,23 +1,26 @@
+import os
+import sys
 import networkx as nx
 import matplotlib.pyplot as plt
+import numpy as np
 from collections import defaultdict, deque
 
-def read_blockchain_from_file(filename):
+# Use the simulator's block ID format, so labels match the rest of the outputs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from simulation.block import format_block_id
+
+def read_blockchain_from_archive(archive_path, peer_id=0):
     """
-    Reads lines of the form:
-        block_id | parent_id | arrival_time
-    and returns a list of edges (parent_id -> block_id).
+    Reads the blocks seen by peer_id from the block tree archive written
+    by the simulator and returns a list of edges (parent_id -> block_id).
     """
-    edges = []
-    with open(filename, 'r') as f:
-        for line in f:
-            parts = line.strip().split('|')
-            if len(parts) == 3:
-                block_id, parent_id, arrival_time = [p.strip() for p in parts]
-                # If parent is "None", treat it as having no parent (genesis)
-                if parent_id not in ("None", ""):
-                    edges.append((parent_id, block_id))
-    return edges
+    with np.load(archive_path) as archive:
+        parent = archive['parent']
+        seen = np.flatnonzero(~np.isnan(archive['arrival'][peer_id]))
+
+    # The genesis block has no parent
+    seen = seen[parent[seen] != -1]
+    return [(format_block_id(p), format_block_id(b)) for p, b in zip(parent[seen].tolist(), seen.tolist())]
 
 def build_block_digraph(edges):
     """
@@ -71,13 +74,13 @@ def layer_layout(G, root):
             pos[node] = (x, y)
     return pos
 
-def visualize_blockchain(filename):
+def visualize_blockchain(archive_path, peer_id=0):
     """
-    Reads the blockchain data from 'filename', builds a directed graph,
+    Reads the block tree of peer_id from the archive, builds a directed graph,
     finds the genesis block, computes a layered layout, and visualizes it.
     """
-    # 1. Parse the file and build edges
-    edges = read_blockchain_from_file(filename)
+    # 1. Load the edges
+    edges = read_blockchain_from_archive(archive_path, peer_id)
 
     # 2. Build the directed graph
     G = build_block_digraph(edges)
@@ -96,14 +99,14 @@ def visualize_blockchain(filename):
     nx.draw_networkx_nodes(G, pos, node_color='red', node_size=80)
     nx.draw_networkx_edges(G, pos, edge_color='black', arrows=True, arrowsize=12)
 
-    plt.title("Blockchain Visualization from {}".format(filename))
+    plt.title("Blockchain Visualization of peer {}".format(peer_id))
     plt.axis('off')
     plt.tight_layout()
-    plt.savefig("visualization_peer0.png")
+    plt.savefig("visualization_peer{}.png".format(peer_id))
 
 # -----------------------------
 # Example usage
 # -----------------------------
 if __name__ == "__main__":
-    # Adjust the filename/path as needed:
-    visualize_blockchain("peer_0.txt")
+    # Adjust the path and peer as needed:
+    visualize_blockchain("blocks.npz", peer_id=0)
@@ -1,35 +1,41 @@
+import os
+import sys
 import networkx as nx
 import matplotlib.pyplot as plt
+import numpy as np
+
+# Use the simulator's block ID format, so labels match the rest of the outputs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from simulation.block import format_block_id
 
 SHORT_ID_LENGTH = 6
 
 def shorten_id(block_id):
     if block_id in ("None", "GENESIS"):
         return block_id
-    return block_id[:SHORT_ID_LENGTH]
+    # IDs are zero-padded counters, so the last digits tell blocks apart
+    return block_id[-SHORT_ID_LENGTH:]
 
-def visualize_blockchain_fork(file_path):
+def visualize_blockchain_fork(archive_path, peer_id=0):
     """
-    Reads a peer file containing lines of the form:
-      child_id|parent_id|arrival_time
-    Constructs a directed graph, then focuses on exactly four blocks
-    around the first 'fork' found: the parent node, the forking node,
-    and two of its children.
+    Reads the block tree of peer_id from the archive written by the
+    simulator. Constructs a directed graph, then focuses on exactly four
+    blocks around the first 'fork' found: the parent node, the forking
+    node, and two of its children.
     """
     # -- 1. Build the full graph --
-    G = nx.DiGraph()
-    with open(file_path, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            child, parent, arrival_str = line.split('|')
-            # We won't worry about arrival_time except to store it as an edge attribute
-            arrival_time = float(arrival_str)
+    with np.load(archive_path) as archive:
+        parent = archive['parent']
+        arrival = archive['arrival'][peer_id]
+    seen = np.flatnonzero(~np.isnan(arrival))
 
-            G.add_node(parent)
-            G.add_node(child)
-            G.add_edge(parent, child, arrival=arrival_time)
+    G = nx.DiGraph()
+    for child, parent_id, arrival_time in zip(seen.tolist(), parent[seen].tolist(), arrival[seen].tolist()):
+        # The genesis block's parent is stored as -1
+        child, parent_id = format_block_id(child), format_block_id(parent_id if parent_id != -1 else None)
+        G.add_node(parent_id)
+        G.add_node(child)
+        G.add_edge(parent_id, child, arrival=arrival_time)
 
     # -- 2. Find a node that "forks" = has more than 1 child --
     fork_node = None
@@ -78,4 +84,4 @@ def visualize_blockchain_fork(file_path):
     plt.savefig("fork_4blocks.png")
 
 if __name__ == "__main__":
-    visualize_blockchain_fork("peer_0.txt")
+    visualize_blockchain_fork("blocks.npz", peer_id=0)
@@ -1,8 +1,12 @@
 import argparse
-import networkx as nx
+import random
 import time
 from simulation.network import Network
 from simulation.simulator import Simulator
+from simulation.transaction import Transaction
+from simulation.trace import LEVELS, make_tracer
+from simulation.mining import MODES as MINING_MODES
+from simulation import relay
 
 n = 50
 I = 600
@@ -19,14 +23,72 @@ def main():
     parser.add_argument('--z0', type=float, default=z0, help='Percentage of slow nodes')
     parser.add_argument('--z1', type=float, default=z1, help='Percentage of low CPU nodes')
     parser.add_argument('--Ttx', type=float, default=Ttx, help='Mean transaction interarrival time')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed, for reproducible runs')
+    parser.add_argument('--trace-sink', choices=['stdout', 'csv', 'binary', 'none'], default='stdout',
+                        help='Where to write the event trace')
+    parser.add_argument('--trace-level', choices=list(LEVELS), default='txns',
+                        help='Trace mined blocks only, or generated transactions too')
+    parser.add_argument('--trace-file', default=None, help='Trace file for the csv and binary sinks')
+    parser.add_argument('--checkpoint', default=None, help='Periodically save the simulation state to this file')
+    parser.add_argument('--checkpoint-interval', type=float, default=10000,
+                        help='Simulated seconds between checkpoints')
+    parser.add_argument('--resume', default=None,
+                        help='Continue the simulation saved in this checkpoint file; it only saves checkpoints '
+                             'again with --checkpoint')
+    parser.add_argument('--diameter', choices=['exact', 'approx', 'none'], default='approx',
+                        help='How to compute the network diameter; exact is slow for large n')
+    parser.add_argument('--topology-cache', default=None,
+                        help='Directory to cache topologies in, keyed by n and --seed')
+    parser.add_argument('--mining', choices=MINING_MODES, default='peer',
+                        help='Per-peer mining timers, or one network-wide mining oracle')
+    parser.add_argument('--compact-blocks', action='store_true',
+                        help='Relay blocks as short transaction IDs rebuilt from the mempool')
+    parser.add_argument('--no-validation-cache', action='store_true',
+                        help='Validate every block on every peer instead of once for the network')
+    parser.add_argument('--text-trees', action='store_true',
+                        help='Also write each peer\'s block tree to blockchain/peer_<id>.txt')
+    parser.add_argument('--chain-export', default=None,
+                        help='Directory to stream the longest chains of --chain-export-peers to during the run; '
+                             'with --resume, the directory to continue the restored exports in')
+    parser.add_argument('--chain-export-peers', type=int, nargs='+', default=[0],
+                        help='Peers whose longest chain is streamed to --chain-export')
+    parser.add_argument('--headless', action='store_true',
+                        help='Write raw data only: no topology plot and no results table')
     args = parser.parse_args()
-    
-    network = Network(args.n, args.z0, args.z1,I)
-    print(f"Network diameter: {nx.diameter(network.graph)}")
-    print(f"Average degree: {sum(dict(network.graph.degree()).values())/100}")
-    simulator = Simulator(network, args.Ttx, I, max_time)
-    simulator.initialize_events()
-    simulator.run()
+
+    tracer = make_tracer(args.trace_sink, args.trace_level, args.trace_file)
+
+    if args.resume:
+        simulator = Simulator.load_checkpoint(args.resume, tracer, chain_export_dir=args.chain_export)
+        if args.seed is not None:
+            simulator.reseed(args.seed)
+    else:
+        if args.seed is not None:
+            random.seed(args.seed)
+            Transaction.reset_ids()
+
+        network = Network(args.n, args.z0, args.z1,I, topology_seed=args.seed,
+                          topology_cache_dir=args.topology_cache, compact_blocks=args.compact_blocks,
+                          validation_cache=not args.no_validation_cache)
+        if args.diameter == 'exact':
+            print(f"Network diameter: {network.diameter(exact=True)}")
+        elif args.diameter == 'approx':
+            print(f"Network diameter (approx.): {network.diameter()}")
+        print(f"Average degree: {sum(len(neighbors) for neighbors in network.adjacency) / len(network.adjacency)}")
+        simulator = Simulator(network, args.Ttx, I, max_time, tracer, mining=args.mining)
+        simulator.initialize_events()
+        if args.chain_export:
+            simulator.enable_chain_export(args.chain_export, args.chain_export_peers)
+
+    if args.checkpoint:
+        simulator.enable_checkpoints(args.checkpoint, args.checkpoint_interval)
+    simulator.run(verbose=not args.headless, headless=args.headless, text_trees=args.text_trees)
+
+    if simulator.network.peers[0].compact_blocks:
+        summary = relay.summarize(simulator.network.peers)
+        print(f"Compact blocks: {summary['blocks']} received, {summary['hit_rate']:.1%} rebuilt from the mempool, "
+              f"{summary['missing_txn_rate']:.2%} of transactions fetched, "
+              f"{summary['bytes_saved_per_block'] / 1024:.1f} KB saved per block")
     
     end_time = time.time()
     execution_time = end_time - start_time
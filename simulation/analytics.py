@@ -0,0 +1,229 @@
+import numpy as np
+from .archive import canonical_tip, chain_mask, load_archive
+
+# Fork and stale-block statistics of all peers, computed from a block tree
+# archive. The arrival matrix is read in chunks of peers, and every step is an
+# array operation over a chunk, so the cost grows linearly with blocks x peers.
+#
+# The canonical chain is the longest chain of the run (ties go to the tip most
+# peers are on). A peer's tip history is rebuilt from the order in which it
+# received blocks: a block becomes the tip when it arrives before any block at
+# least as deep, as in Peer.accept_block. Blocks often arrive at exactly the same
+# time (messages queued on one link are delivered together), so times alone
+# cannot tell which of two siblings the peer took. Archives written before the
+# arrival order was recorded fall back to arrival times, taking ties in ID
+# order, which can misassign some reorgs.
+
+PEER_COLUMNS = ["Node No", "Speed", "CPU", "Stale Blocks Seen", "Stale Blocks Mined", "Reorgs",
+                "Max Reorg Depth", "Fork Branches", "Mean Branch Length", "Max Branch Length",
+                "Time on Non-Canonical Tip"]
+CLASS_COLUMNS = ["Speed", "CPU", "Peers"] + PEER_COLUMNS[3:]
+
+# Peers per chunk are chosen so that a chunk holds about this many arrival times
+CHUNK_CELLS = 1 << 22
+
+
+def fork_heights(parent, depth, on_chain):
+    """
+    Returns, for every block, the height at which its branch forks off the
+    canonical chain (its own height for canonical blocks).
+    """
+    height = depth.astype(np.int64)
+    # Parents come before their children in ID order (see archive)
+    for block in np.flatnonzero(~on_chain).tolist():
+        height[block] = height[parent[block]]
+    return height
+
+
+def common_ancestors(parent, depth, a, b):
+    """
+    Common ancestors of the pairs of blocks (a[i], b[i]), found by stepping
+    all pairs towards the root together.
+    """
+    a, b = a.copy(), b.copy()
+    pending = np.flatnonzero(a != b)
+    while len(pending):
+        depth_a, depth_b = depth[a[pending]], depth[b[pending]]
+        step_a, step_b = depth_a >= depth_b, depth_b >= depth_a
+        a[pending[step_a]] = parent[a[pending[step_a]]]
+        b[pending[step_b]] = parent[b[pending[step_b]]]
+        pending = pending[a[pending] != b[pending]]
+    return a
+
+
+def tip_history(arrival, order, by_depth, group_starts):
+    """
+    Returns the successive tips of a chunk of peers as arrays (peer row,
+    block, time), sorted by peer and then by height, which is also by time.
+    Blocks are ranked by their arrival order, or by their arrival time if
+    order is None.
+    """
+    if order is None:
+        ranks = arrival[:, by_depth]
+        ranks[np.isnan(ranks)] = np.inf
+    else:
+        ranks = order[:, by_depth].astype(np.float64)
+        ranks[ranks < 0] = np.inf
+
+    # First arrival at every height, and whether a block as deep or deeper arrived before it
+    first = np.minimum.reduceat(ranks, group_starts, axis=1)
+    deeper_first = np.minimum.accumulate(first[:, ::-1], axis=1)[:, ::-1]
+    becomes_tip = np.isfinite(first)
+    becomes_tip[:, :-1] &= first[:, :-1] <= deeper_first[:, 1:]
+
+    sizes = np.diff(np.r_[group_starts, ranks.shape[1]])
+    is_tip = (ranks == np.repeat(first, sizes, axis=1)) & np.repeat(becomes_tip, sizes, axis=1)
+    rows, positions = np.nonzero(is_tip)
+
+    # Arrival times can tie; keep the lowest ID per peer and height then
+    groups = np.repeat(np.arange(len(group_starts)), sizes)[positions]
+    keep = np.r_[True, (rows[1:] != rows[:-1]) | (groups[1:] != groups[:-1])]
+    rows, positions = rows[keep], positions[keep]
+    blocks = by_depth[positions]
+    return rows, blocks, arrival[rows, blocks]
+
+
+def analyze_archive(archive_path):
+    """
+    Computes the fork statistics of every peer in an archive. Returns a dict
+    of per-peer arrays (keyed by PEER_COLUMNS names in snake case), plus
+    'reorg_depths' and 'branch_lengths', counts indexed by depth and length
+    over all peers.
+    """
+    archive = load_archive(archive_path, mmap_mode='r')
+    parent, depth, miner = np.array(archive['parent']), np.array(archive['depth']), np.array(archive['miner'])
+    tips = np.array(archive['tip'])
+    arrival, arrival_order = archive['arrival'], archive.get('arrival_order')
+    num_peers, num_blocks = arrival.shape
+
+    on_chain = chain_mask(parent, canonical_tip(depth, tips))
+    fork_height = fork_heights(parent, depth, on_chain)
+    stale = np.flatnonzero(~on_chain)
+    # Stale blocks whose parent is stale too, as positions in stale
+    stale_index = np.full(num_blocks, -1)
+    stale_index[stale] = np.arange(len(stale))
+    child_of_stale = np.flatnonzero(stale_index[parent[stale]] >= 0)
+    parent_of_child = stale_index[parent[stale[child_of_stale]]]
+    branch_length = depth[stale] - fork_height[stale]
+
+    by_depth = np.argsort(depth, kind='stable')
+    sorted_depth = depth[by_depth]
+    group_starts = np.flatnonzero(np.r_[True, sorted_depth[1:] != sorted_depth[:-1]])
+
+    stats = {
+        'stale_blocks_seen': np.zeros(num_peers, dtype=np.int64),
+        'stale_blocks_mined': np.bincount(miner[stale], minlength=num_peers)[:num_peers],
+        'reorgs': np.zeros(num_peers, dtype=np.int64),
+        'max_reorg_depth': np.zeros(num_peers, dtype=np.int64),
+        'fork_branches': np.zeros(num_peers, dtype=np.int64),
+        'mean_branch_length': np.zeros(num_peers),
+        'max_branch_length': np.zeros(num_peers, dtype=np.int64),
+        'time_on_non_canonical_tip': np.zeros(num_peers),
+    }
+    reorg_depths, branch_lengths = [], []
+    last_tip, last_time = np.zeros(num_peers, dtype=np.int64), np.zeros(num_peers)
+    end_time = 0.0
+
+    chunk = max(1, CHUNK_CELLS // max(1, num_blocks))
+    for start in range(0, num_peers, chunk):
+        rows = np.arange(start, min(start + chunk, num_peers))
+        times = np.array(arrival[start:rows[-1] + 1])
+        order = np.array(arrival_order[start:rows[-1] + 1]) if arrival_order is not None else None
+        seen = ~np.isnan(times)
+        if seen.any():
+            end_time = max(end_time, float(np.nanmax(times)))
+
+        # Stale blocks and fork branches: a branch ends at a stale block none of whose children the peer saw
+        seen_stale = seen[:, stale]
+        stats['stale_blocks_seen'][rows] = seen_stale.sum(axis=1)
+        has_child = np.zeros((len(stale), len(rows)), dtype=np.int32)
+        np.add.at(has_child, parent_of_child, seen_stale.T[child_of_stale])
+        branch_end = seen_stale & (has_child.T == 0)
+        lengths = np.where(branch_end, branch_length, 0)
+        stats['fork_branches'][rows] = branch_end.sum(axis=1)
+        stats['max_branch_length'][rows] = lengths.max(axis=1, initial=0)
+        stats['mean_branch_length'][rows] = lengths.sum(axis=1) / np.maximum(1, stats['fork_branches'][rows])
+        branch_lengths.append(branch_length[np.nonzero(branch_end)[1]])
+
+        # Reorgs: tip changes to a block that does not extend the previous tip
+        peer_rows, tip, tip_time = tip_history(times, order, by_depth, group_starts)
+        peer = rows[peer_rows]
+        same_peer = peer[1:] == peer[:-1]
+        old, new = tip[:-1][same_peer], tip[1:][same_peer]
+        is_reorg = parent[new] != old
+        reorg_peer, old, new = peer[1:][same_peer][is_reorg], old[is_reorg], new[is_reorg]
+        depths = depth[old] - depth[common_ancestors(parent, depth, old, new)]
+        stats['reorgs'][rows] = np.bincount(reorg_peer - start, minlength=len(rows))
+        np.maximum.at(stats['max_reorg_depth'], reorg_peer, depths)
+        reorg_depths.append(depths)
+
+        # Time on a tip off the canonical chain, up to the next tip change
+        held = np.diff(tip_time)[same_peer]
+        off_chain = ~on_chain[tip[:-1][same_peer]]
+        stats['time_on_non_canonical_tip'] += np.bincount(peer[:-1][same_peer][off_chain],
+                                                          weights=held[off_chain], minlength=num_peers)
+        is_last = np.r_[~same_peer, True]
+        last_tip[peer[is_last]], last_time[peer[is_last]] = tip[is_last], tip_time[is_last]
+
+    # The last tip is held until the end of the run
+    off_chain = ~on_chain[last_tip]
+    stats['time_on_non_canonical_tip'][off_chain] += end_time - last_time[off_chain]
+
+    stats['is_slow'] = np.array(archive['is_slow'])
+    stats['is_low_cpu'] = np.array(archive['is_low_cpu'])
+    stats['reorg_depths'] = np.bincount(np.concatenate(reorg_depths).astype(np.int64))
+    stats['branch_lengths'] = np.bincount(np.concatenate(branch_lengths).astype(np.int64))
+    return stats
+
+
+def _column_key(column):
+    return column.lower().replace(' ', '_').replace('-', '_')
+
+
+def peer_rows(stats):
+    rows = []
+    for peer in range(len(stats['is_slow'])):
+        rows.append([peer, "slow" if stats['is_slow'][peer] else "fast",
+                     "low" if stats['is_low_cpu'][peer] else "high"]
+                    + [stats[_column_key(column)][peer].item() for column in PEER_COLUMNS[3:]])
+    return rows
+
+
+def class_rows(stats):
+    """
+    Averages the per-peer statistics over each slow/fast and low/high CPU
+    class of peers.
+    """
+    rows = []
+    for is_slow in (False, True):
+        for is_low_cpu in (False, True):
+            members = (stats['is_slow'] == is_slow) & (stats['is_low_cpu'] == is_low_cpu)
+            if members.any():
+                rows.append(["slow" if is_slow else "fast", "low" if is_low_cpu else "high", int(members.sum())]
+                            + [round(float(stats[_column_key(column)][members].mean()), 3)
+                               for column in PEER_COLUMNS[3:]])
+    return rows
+
+
+def print_report(stats):
+    print("Fork statistics by peer class (averages per peer):")
+    for row in class_rows(stats):
+        print("  " + ", ".join(f"{column}: {value}" for column, value in zip(CLASS_COLUMNS, row)))
+    print("Reorg depths:", {depth: count for depth, count in enumerate(stats['reorg_depths'].tolist()) if count})
+    print("Fork branch lengths:",
+          {length: count for length, count in enumerate(stats['branch_lengths'].tolist()) if count})
+
+
+if __name__ == '__main__':
+    import argparse
+    from .report import write_statistics_csv
+
+    parser = argparse.ArgumentParser(description='Fork and stale-block statistics of all peers in an archive')
+    parser.add_argument('archive', nargs='?', default="blockchain/blocks.npz", help='Block tree archive')
+    parser.add_argument('--csv', default=None, help='Also write the per-peer statistics to this CSV file')
+    args = parser.parse_args()
+
+    stats = analyze_archive(args.archive)
+    print_report(stats)
+    if args.csv:
+        write_statistics_csv(peer_rows(stats), args.csv, PEER_COLUMNS)
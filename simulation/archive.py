@@ -0,0 +1,148 @@
+import struct
+import zipfile
+import numpy as np
+
+# Archive of the block trees of all peers, written at the end of a run as an
+# uncompressed .npz file. It holds one array per name:
+#   parent, miner, depth, num_txns    block table, indexed by block ID
+#   txn_offset                        the transactions of block b are rows
+#                                     txn_offset[b] to txn_offset[b + 1] of
+#   txn_id, sender, recipient, amount, coinbase
+#                                     the transaction table
+#   arrival                           peer x block arrival times, NaN if unseen
+#   arrival_order                     peer x block position of the block in the
+#                                     order the peer received blocks, -1 if unseen
+#   is_slow, is_low_cpu, hashing_power, tip
+#                                     peer table, indexed by peer ID
+# np.load reads it as usual; load_archive can also memory-map the arrays.
+# Block IDs are allocated in mining order, so every block's ID is larger than
+# its parent's: walking blocks by ID visits parents before their children, and
+# the blocks of a chain sorted by ID are in chain order.
+ARCHIVE_NAME = "blocks.npz"
+
+# Transaction table columns: (array name, Transaction attribute, dtype)
+TXN_COLUMNS = (
+    ('txn_id', 'txn_id', np.int64),
+    ('sender', 'sender_id', np.int32),
+    ('recipient', 'recipient_id', np.int32),
+    ('amount', 'amount', np.int64),
+    ('coinbase', 'coinbase', np.bool_),
+)
+
+
+class ArchiveWriter:
+    """
+    Streams arrays into an uncompressed .npz archive one at a time. Large
+    arrays can be written in chunks (e.g. rows) without ever being built in
+    memory.
+    """
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True)
+
+    def write(self, name, array):
+        with self.zip.open(name + '.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, np.asarray(array), allow_pickle=False)
+
+    def write_chunks(self, name, shape, dtype, chunks):
+        dtype = np.dtype(dtype)
+        header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape}
+        with self.zip.open(name + '.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array_header_2_0(f, header)
+            for chunk in chunks:
+                f.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_archive(path, block_store, peers):
+    num_blocks = len(block_store)
+    blocks = block_store.blocks
+    num_txns = np.fromiter((len(block.transactions) for block in blocks), dtype=np.int64, count=num_blocks)
+    total_txns = int(num_txns.sum())
+
+    def txn_column(field, dtype):
+        for block in blocks:
+            yield np.fromiter((getattr(tx, field) for tx in block.transactions), dtype=dtype)
+
+    def view_rows(column, missing, dtype):
+        row = np.empty(num_blocks, dtype=dtype)
+        for peer in peers:
+            values = np.asarray(getattr(peer.block_view, column))
+            row.fill(missing)
+            row[:len(values)] = values
+            yield row
+
+    with ArchiveWriter(path) as writer:
+        writer.write('parent', np.asarray(block_store.parent, dtype=np.int64))
+        writer.write('miner', np.asarray(block_store.miner, dtype=np.int32))
+        writer.write('depth', np.asarray(block_store.depth, dtype=np.int32))
+        writer.write('num_txns', num_txns.astype(np.int32))
+        writer.write('txn_offset', np.concatenate(([0], np.cumsum(num_txns))))
+        for name, field, dtype in TXN_COLUMNS:
+            writer.write_chunks(name, (total_txns,), dtype, txn_column(field, dtype))
+        writer.write_chunks('arrival', (len(peers), num_blocks), np.float64,
+                            view_rows('arrival_time', np.nan, np.float64))
+        writer.write_chunks('arrival_order', (len(peers), num_blocks), np.int32,
+                            view_rows('arrival_order', -1, np.int32))
+
+        writer.write('is_slow', np.array([peer.is_slow for peer in peers]))
+        writer.write('is_low_cpu', np.array([peer.is_low_cpu for peer in peers]))
+        writer.write('hashing_power', np.array([peer.hashing_power for peer in peers]))
+        writer.write('tip', np.array([peer.longest_chain_tip.id for peer in peers], dtype=np.int64))
+
+
+def load_archive(path, mmap_mode=None):
+    """
+    Returns the arrays of an archive as a dict. With mmap_mode (as for
+    np.load, e.g. 'r') the arrays are memory-mapped from the file instead
+    of read, which works because the archive is not compressed.
+    """
+    if mmap_mode is None:
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            # Skip the local file header to the start of the .npy data
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            arrays[info.filename[:-len('.npy')]] = np.memmap(
+                path, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape,
+                order='F' if fortran_order else 'C')
+    return arrays
+
+
+def canonical_tip(depth, tips):
+    """
+    Returns the tip of the longest chain among the peers' tips; ties go to
+    the tip most peers are on.
+    """
+    distinct, peer_counts = np.unique(tips, return_counts=True)
+    return int(distinct[np.lexsort((peer_counts, depth[distinct]))[-1]])
+
+
+def chain_mask(parent, tip):
+    """
+    Returns a boolean mask, indexed by block ID, of the blocks on the chain
+    ending at tip, genesis included.
+    """
+    on_chain = np.zeros(len(parent), dtype=bool)
+    while tip != -1:
+        on_chain[tip] = True
+        tip = int(parent[tip])
+    return on_chain
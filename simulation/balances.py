@@ -0,0 +1,104 @@
+from collections import OrderedDict
+import numpy as np
+
+def block_delta(block):
+    """
+    Returns the balance changes made by a block as {account: change}.
+    """
+    delta = {}
+    for tx in block.transactions:
+        if tx.coinbase:
+            delta[tx.recipient_id] = delta.get(tx.recipient_id, 0) + tx.amount
+        else:
+            delta[tx.sender_id] = delta.get(tx.sender_id, 0) - tx.amount
+            delta[tx.recipient_id] = delta.get(tx.recipient_id, 0) + tx.amount
+    return delta
+
+
+class BalanceOverlay:
+    """
+    Copy-on-write view of a balance array. Only the accounts that are
+    written are stored, so checking a block never copies the full array.
+    """
+    __slots__ = ('base', 'changed')
+
+    def __init__(self, base):
+        self.base = base
+        self.changed = {}
+
+    def __getitem__(self, account):
+        try:
+            return self.changed[account]
+        except KeyError:
+            return int(self.base[account])
+
+    def __setitem__(self, account, value):
+        self.changed[account] = value
+
+
+class BalanceStore:
+    """
+    Account balances after every block of the shared block tree, keyed by
+    block ID. The balances after a block are the same for every peer, so one
+    store serves the whole network. Each block stores only its delta against
+    the parent. Blocks at depths that are multiples of checkpoint_interval
+    also keep a full balance array, and the most recently materialized
+    arrays are kept in an LRU cache.
+    """
+    def __init__(self, num_accounts, block_store, checkpoint_interval=64, cache_size=32):
+        self.num_accounts = num_accounts
+        self.checkpoint_interval = checkpoint_interval
+        self.cache_size = cache_size
+
+        self.parent = block_store.parent
+        self.depth = block_store.depth
+        self.deltas = {}
+        self.checkpoints = {}
+        self.cache = OrderedDict()
+
+    def __contains__(self, block_id):
+        return block_id in self.deltas
+
+    def add_block(self, block_id, delta):
+        # Every peer that accepts a block adds it; the first one stores it
+        if block_id in self.deltas:
+            return
+        self.deltas[block_id] = delta
+        if self.depth[block_id] % self.checkpoint_interval == 0:
+            self.checkpoints[block_id] = self.balances(block_id)
+
+    def balances(self, block_id):
+        """
+        Returns the balance array after block_id. The array is shared with
+        the store and must be copied before it is modified.
+        """
+        cached = self.cache.get(block_id)
+        if cached is not None:
+            self.cache.move_to_end(block_id)
+            return cached
+
+        # Walk back to the nearest materialized ancestor
+        chain_segment = []
+        current = block_id
+        while current != -1:
+            base = self.cache.get(current)
+            if base is None:
+                base = self.checkpoints.get(current)
+            if base is not None:
+                break
+            chain_segment.append(current)
+            current = self.parent[current]
+
+        if current == -1:
+            balances = np.zeros(self.num_accounts, dtype=np.int64)
+        else:
+            balances = base.copy()
+
+        for bid in reversed(chain_segment):
+            for account, change in self.deltas[bid].items():
+                balances[account] += change
+
+        self.cache[block_id] = balances
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return balances
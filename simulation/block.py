@@ -1,12 +1,19 @@
-import hashlib
-import uuid
-import json
+GENESIS_ID = 0
+
+def format_block_id(block_id):
+    if block_id is None:
+        return "None"
+    if block_id == GENESIS_ID:
+        return "GENESIS"
+    return f"{block_id:08x}"
 
 class Block:
-    GENESIS = None 
+    __slots__ = ('id', 'prev_id', 'transactions', 'miner_id')
+
+    MAX_SIZE = 1024 * 1024  # 1 MB
 
     def __init__(self, prev_id, transactions, miner_id):
-        self.id = str(uuid.uuid4())
+        self.id = None  # Assigned by the BlockStore once mined
         self.prev_id = prev_id
         self.transactions = transactions
         self.miner_id = miner_id
@@ -17,6 +24,4 @@ class Block:
         return max(1, num_txs) * 1024  # at least 1 KB
 
     def is_valid_size(self):
-        return self.size <= 1024 * 1024  # <= 1MB
-
-
+        return self.size <= Block.MAX_SIZE
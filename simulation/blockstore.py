@@ -0,0 +1,166 @@
+from array import array
+from simulation.block import Block, GENESIS_ID
+
+def _invert_lowest_one(n):
+    return n & (n - 1)
+
+def _skip_height(height):
+    """
+    Height that the skip pointer of a block at the given height points to.
+    Any height is reached in O(log height) jumps along skip pointers.
+    """
+    if height < 2:
+        return 0
+    if height & 1:
+        return _invert_lowest_one(_invert_lowest_one(height - 1)) + 1
+    return _invert_lowest_one(height)
+
+class BlockStore:
+    """
+    Block tree shared by all peers. Every mined block gets the next integer
+    ID, and its parent, depth and miner are kept in compact arrays indexed
+    by it. The genesis block has ID 0, and parent and miner -1. Each block
+    also has a skip pointer to an ancestor further down, which makes
+    ancestor and common-ancestor lookups O(log height).
+    """
+    def __init__(self):
+        self.blocks = []  # Block objects by ID
+        self.parent = array('l')
+        self.depth = array('l')
+        self.miner = array('l')
+        self.skip = array('l')
+
+        genesis_blk = Block(
+            prev_id=None,
+            transactions=[],
+            miner_id="GENESIS"
+        )
+        self.genesis = genesis_blk
+        self.add(genesis_blk)
+        assert genesis_blk.id == GENESIS_ID
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def add(self, block):
+        block_id = len(self.blocks)
+        block.id = block_id
+        self.blocks.append(block)
+
+        if block.prev_id is None:
+            self.parent.append(-1)
+            self.depth.append(0)
+            self.miner.append(-1)
+            self.skip.append(-1)
+        else:
+            depth = self.depth[block.prev_id] + 1
+            self.parent.append(block.prev_id)
+            self.depth.append(depth)
+            self.miner.append(block.miner_id)
+            self.skip.append(self.ancestor_at(block.prev_id, _skip_height(depth)))
+        return block_id
+
+    def ancestor_at(self, block_id, height):
+        """
+        Returns the ancestor of block_id at the given height, or -1 if
+        height is above the block.
+        """
+        depth = self.depth
+        walk_height = depth[block_id]
+        if height > walk_height or height < 0:
+            return -1
+
+        walk = block_id
+        while walk_height > height:
+            skip_height = _skip_height(walk_height)
+            skip_height_prev = _skip_height(walk_height - 1)
+            # Only follow the skip pointer if the parent's would not be better
+            if self.skip[walk] != -1 and (skip_height == height or
+                    (skip_height > height and not (skip_height_prev < skip_height - 2 and
+                                                   skip_height_prev >= height))):
+                walk = self.skip[walk]
+                walk_height = skip_height
+            else:
+                walk = self.parent[walk]
+                walk_height -= 1
+        return walk
+
+    def common_ancestor(self, a, b):
+        """
+        Returns the deepest block that is an ancestor of both a and b.
+        """
+        depth = self.depth
+        if depth[a] > depth[b]:
+            a = self.ancestor_at(a, depth[b])
+        elif depth[b] > depth[a]:
+            b = self.ancestor_at(b, depth[a])
+
+        # Walk both down together, jumping whenever the skip pointers differ
+        while a != b:
+            if self.skip[a] != self.skip[b]:
+                a = self.skip[a]
+                b = self.skip[b]
+            else:
+                a = self.parent[a]
+                b = self.parent[b]
+        return a
+
+    def is_ancestor(self, ancestor, block_id):
+        return self.ancestor_at(block_id, self.depth[ancestor]) == ancestor
+
+    def chain(self, tip, base=-1):
+        """
+        Returns the block IDs from the genesis block to tip, or only those
+        after base if base is an ancestor of tip.
+        """
+        block_ids = []
+        current = tip
+        while current != base:
+            block_ids.append(current)
+            current = self.parent[current]
+        block_ids.reverse()
+        return block_ids
+
+
+class BlockView:
+    """
+    The part of the shared block tree one peer has seen: a bitset of block
+    IDs, a column of arrival times (NaN for unseen blocks) and a column of
+    arrival order (-1 for unseen blocks), which tells apart blocks that
+    arrived at the same time.
+    """
+    __slots__ = ('seen', 'arrival_time', 'arrival_order', 'count')
+
+    def __init__(self):
+        self.seen = bytearray()
+        self.arrival_time = array('d')
+        self.arrival_order = array('i')
+        self.count = 0
+
+    def __contains__(self, index):
+        byte = index >> 3
+        return byte < len(self.seen) and (self.seen[byte] >> (index & 7)) & 1 == 1
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for byte_index, byte in enumerate(self.seen):
+            if byte:
+                for bit in range(8):
+                    if (byte >> bit) & 1:
+                        yield (byte_index << 3) | bit
+
+    def add(self, index, time):
+        byte = index >> 3
+        if byte >= len(self.seen):
+            self.seen.extend(bytes(byte + 1 - len(self.seen)))
+        self.seen[byte] |= 1 << (index & 7)
+
+        if index >= len(self.arrival_time):
+            missing = index + 1 - len(self.arrival_time)
+            self.arrival_time.extend([float('nan')] * missing)
+            self.arrival_order.extend([-1] * missing)
+        self.arrival_time[index] = time
+        self.arrival_order[index] = self.count
+        self.count += 1
@@ -0,0 +1,160 @@
+import os
+import numpy as np
+from .block import format_block_id
+
+# A chain export is a pair of files of fixed-width little-endian records:
+#   <path>.idx  one BLOCK_RECORD per height, starting at height 1
+#   <path>.txn  the TXN_RECORDs of all blocks, in chain order
+# Block and transaction records of any height range are found with O(1)
+# arithmetic, and both files can be memory-mapped while they are appended to.
+BLOCK_RECORD = np.dtype([('block_id', '<i8'), ('miner', '<i4'), ('num_txns', '<i4'), ('txn_offset', '<i8')])
+TXN_RECORD = np.dtype([('txn_id', '<i8'), ('sender', '<i4'), ('recipient', '<i4'), ('amount', '<i8'),
+                       ('coinbase', 'u1')])
+
+
+class ChainWriter:
+    """
+    Appends the blocks of a chain to an export as they are connected, and
+    truncates it back to the fork point when blocks are disconnected. Every
+    change is flushed, so readers that map the files see the chain as the
+    simulation runs.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.height = 0
+        self.num_txns = 0
+        self.blocks = open(path + '.idx', 'w+b')
+        self.txns = open(path + '.txn', 'w+b')
+
+    def __getstate__(self):
+        # Checkpoints keep the length of the export, and the files are synced so that they hold at least that much
+        self.flush()
+        for f in (self.blocks, self.txns):
+            os.fsync(f.fileno())
+        return {'path': self.path, 'height': self.height, 'num_txns': self.num_txns}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.height = state['height']
+        self.num_txns = state['num_txns']
+        self.blocks = self.txns = None  # Opened by reopen
+
+    def reopen(self, path=None):
+        """
+        Reopens the export of a writer restored from a checkpoint, cut back
+        to its length at the checkpoint. The export is reopened in place, so
+        a run resumed from an earlier checkpoint rewrites the files of the
+        run that saved it. Give path to copy the export there and continue
+        it there instead, e.g. for a what-if branch.
+        """
+        sizes = (('.idx', self.height * BLOCK_RECORD.itemsize), ('.txn', self.num_txns * TXN_RECORD.itemsize))
+        for suffix, size in sizes:
+            if os.path.getsize(self.path + suffix) < size:
+                raise ValueError(f"Chain export {self.path}{suffix} is shorter than at the checkpoint")
+
+        if path is not None and path != self.path:
+            for suffix, size in sizes:
+                with open(self.path + suffix, 'rb') as src, open(path + suffix, 'wb') as dst:
+                    while size:
+                        chunk = src.read(min(size, 1 << 24))
+                        dst.write(chunk)
+                        size -= len(chunk)
+            self.path = path
+
+        self.blocks = open(self.path + '.idx', 'r+b')
+        self.txns = open(self.path + '.txn', 'r+b')
+        for f, (_, size) in zip((self.blocks, self.txns), sizes):
+            f.truncate(size)
+            f.seek(size)
+
+    def append(self, block):
+        transactions = block.transactions
+        record = np.array([(block.id, block.miner_id, len(transactions), self.num_txns)], dtype=BLOCK_RECORD)
+        self.blocks.write(record.tobytes())
+        self.txns.write(np.fromiter(
+            ((tx.txn_id, tx.sender_id, tx.recipient_id, tx.amount, tx.coinbase) for tx in transactions),
+            dtype=TXN_RECORD, count=len(transactions)).tobytes())
+        self.height += 1
+        self.num_txns += len(transactions)
+        self.flush()
+
+    def truncate(self, height):
+        """
+        Drops the blocks above height.
+        """
+        self.blocks.flush()
+        if height > 0:
+            self.blocks.seek((height - 1) * BLOCK_RECORD.itemsize)
+            record = np.frombuffer(self.blocks.read(BLOCK_RECORD.itemsize), dtype=BLOCK_RECORD)[0]
+            self.num_txns = int(record['txn_offset'] + record['num_txns'])
+        else:
+            self.num_txns = 0
+        self.height = height
+
+        for f, size in ((self.blocks, height * BLOCK_RECORD.itemsize),
+                        (self.txns, self.num_txns * TXN_RECORD.itemsize)):
+            f.flush()
+            f.truncate(size)
+            f.seek(size)
+
+    def flush(self):
+        self.blocks.flush()
+        self.txns.flush()
+
+    def close(self):
+        self.blocks.close()
+        self.txns.close()
+
+
+def _map(path, dtype):
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+class ChainReader:
+    """
+    Memory-mapped view of a chain export. Heights start at 1, the block
+    after the genesis block.
+    """
+    def __init__(self, path):
+        self.blocks = _map(path + '.idx', BLOCK_RECORD)
+        self.txns = _map(path + '.txn', TXN_RECORD)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def block(self, height):
+        """
+        Returns the block record at height and its transaction records.
+        """
+        record = self.blocks[height - 1]
+        start = record['txn_offset']
+        return record, self.txns[start:start + record['num_txns']]
+
+    def block_range(self, start, stop):
+        """
+        Returns the block records of heights start to stop - 1 and all of
+        their transaction records.
+        """
+        records = self.blocks[start - 1:stop - 1]
+        if len(records) == 0:
+            return records, self.txns[:0]
+        last = records[-1]
+        return records, self.txns[records[0]['txn_offset']:last['txn_offset'] + last['num_txns']]
+
+
+def render_text(reader, file_name, start=1, stop=None):
+    """
+    Writes the blocks of heights start to stop - 1 in the text format of
+    Peer.export_included_transactions.
+    """
+    stop = len(reader) + 1 if stop is None else stop
+    with open(file_name, "w") as outfile:
+        for height in range(start, stop):
+            record, txns = reader.block(height)
+            outfile.write(f"Block ID: {format_block_id(int(record['block_id']))}, Miner: {record['miner']}\n")
+            outfile.write("Transactions:\n")
+            for txn_id, sender, recipient, amount, _ in txns.tolist():
+                outfile.write(f"    TxnID:{txn_id:08x} => {sender} pays {recipient} {amount} coins\n")
+            outfile.write("\n")
@@ -1,21 +1,82 @@
 import heapq
 
+# Event type codes, used as indices into the simulator's dispatch table
+GENERATE_TXN = 0
+RECEIVE_TXN = 1
+MINE_BLOCK = 2
+RECEIVE_BLOCK = 3
+LINK_DELIVERY = 4
+
+# Compact block relay message types, which only travel over links
+CMPCT_BLOCK = 5
+GET_BLOCK_TXN = 6
+BLOCK_TXN = 7
+
 class Event:
-    def __init__(self, timestamp, callback, msg = None):
+    __slots__ = ('timestamp', 'kind', 'peer_id', 'msg', 'queue')
+
+    def __init__(self, timestamp, kind, peer_id, msg = None):
         self.timestamp = timestamp
-        self.callback = callback  # Signature: callback(current_time, event_queue, event)
-        self.msg = msg 
+        self.kind = kind        # Event type code
+        self.peer_id = peer_id  # Index of the peer handling the event
+        self.msg = msg
+        self.queue = None       # EventQueue holding the event while it is pending
+
+    def cancel(self):
+        """
+        Withdraws a pending event so that it is never handled. Does nothing
+        if the event was already handled or cancelled.
+        """
+        if self.queue is not None:
+            self.queue.cancel(self)
 
 class EventQueue:
+    """
+    Priority queue of events ordered by timestamp, then insertion order.
+    Cancelled events are deleted lazily: they stay in the heap, marked
+    dead, and are skipped when they reach the top. Once dead entries make
+    up more than COMPACT_FRACTION of the heap, it is rebuilt without them.
+    """
+    COMPACT_FRACTION = 0.5
+    COMPACT_MIN_SIZE = 1024  # Smaller heaps are never compacted
+
     def __init__(self):
         self.events = []
-        self.counter = 0 
-    
+        self.counter = 0
+        self.dead = 0  # Cancelled events still in the heap
+
+    def __len__(self):
+        return len(self.events) - self.dead
+
     def add_event(self, event):
+        event.queue = self
         heapq.heappush(self.events, (event.timestamp, self.counter, event))
         self.counter += 1
-    
+        return event
+
+    def cancel(self, event):
+        event.queue = None
+        self.dead += 1
+        if self.dead > self.COMPACT_MIN_SIZE and self.dead > len(self.events) * self.COMPACT_FRACTION:
+            self.compact()
+
+    def compact(self):
+        self.events = [entry for entry in self.events if entry[2].queue is self]
+        heapq.heapify(self.events)
+        self.dead = 0
+
     def next_event(self):
-        if self.events:
-            return heapq.heappop(self.events)[2]
-        return None
\ No newline at end of file
+        return self.next_event_until(float('inf'))
+
+    def next_event_until(self, time):
+        """
+        Pops the next live event if it happens no later than time.
+        """
+        events = self.events
+        while events and events[0][0] <= time:
+            event = heapq.heappop(events)[2]
+            if event.queue is self:
+                event.queue = None
+                return event
+            self.dead -= 1
+        return None
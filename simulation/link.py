@@ -0,0 +1,102 @@
+from collections import deque
+from simulation.event import Event, LINK_DELIVERY
+import numpy as np
+
+class LinkTable:
+    """
+    Parameters of all directed links as NumPy arrays indexed by edge ID:
+    propagation delay rho, capacity c and mean queuing delay 96000/c.
+
+    Queuing delays are exponential with mean mean_d. They are drawn as unit
+    exponentials in large batches and scaled by the link's mean, which has
+    the same distribution as drawing each delay separately per link.
+    """
+    BATCH_SIZE = 1 << 16
+
+    def __init__(self, src, dst, rho, c, seed=None):
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.rho = np.asarray(rho, dtype=np.float64)
+        self.c = np.asarray(c, dtype=np.float64)
+        self.mean_d = 96000 / self.c
+
+        # Plain-list copies for the relay path, where indexing a list is
+        # several times faster than indexing a NumPy array
+        self.rho_at = self.rho.tolist()
+        self.c_at = self.c.tolist()
+        self.mean_d_at = self.mean_d.tolist()
+
+        self.rng = np.random.default_rng(seed)
+        self.delays = []  # Pre-sampled unit exponentials, consumed from the end
+
+        self.links = [Link(edge, s, d, self) for edge, (s, d) in enumerate(zip(src, dst))]
+
+    def __len__(self):
+        return len(self.links)
+
+    def reseed(self, seed):
+        """
+        Restarts the queuing delays from a new seed, dropping the rest of
+        the current batch.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.delays = []
+
+    def queuing_delay(self, edge):
+        if not self.delays:
+            self.delays = self.rng.standard_exponential(self.BATCH_SIZE).tolist()
+        return self.delays.pop() * self.mean_d_at[edge]
+
+
+class Link:
+    """
+    Directed link from peer src to peer dst, with its parameters in the
+    LinkTable row edge. Messages are serialized onto the link at rate c, so
+    a message only starts transmitting once the previous one has left, and
+    are delivered in FIFO order. Only the delivery of the head of the queue
+    is kept in the global event queue.
+    """
+    __slots__ = ('edge', 'src', 'dst', 'table', 'queue', 'busy_until', 'last_delivery')
+
+    def __init__(self, edge, src, dst, table):
+        self.edge = edge
+        self.src = src
+        self.dst = dst
+        self.table = table
+        self.queue = deque()  # (delivery_time, kind, msg)
+        self.busy_until = 0
+        self.last_delivery = 0
+
+    @property
+    def rho(self):
+        return self.table.rho_at[self.edge]
+
+    @property
+    def c(self):
+        return self.table.c_at[self.edge]
+
+    def send(self, current_time, event_queue, kind, msg, msg_bits):
+        table = self.table
+        edge = self.edge
+        start = max(current_time, self.busy_until)
+        self.busy_until = start + msg_bits / table.c_at[edge]
+
+        d = table.queuing_delay(edge)
+
+        # Keep deliveries in FIFO order
+        delivery_time = max(self.busy_until + table.rho_at[edge] + d, self.last_delivery)
+        self.last_delivery = delivery_time
+
+        self.queue.append((delivery_time, kind, msg))
+        if len(self.queue) == 1:
+            event_queue.add_event(Event(delivery_time, LINK_DELIVERY, self.dst, self))
+
+    def pop(self, event_queue):
+        _, kind, msg = self.queue.popleft()
+        if self.queue:
+            event_queue.add_event(Event(self.queue[0][0], LINK_DELIVERY, self.dst, self))
+        return kind, msg
+
+    @property
+    def backlog(self):
+        return len(self.queue)
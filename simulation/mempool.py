@@ -0,0 +1,94 @@
+class Mempool:
+    """
+    Transactions that are not in the peer's longest chain, kept in arrival
+    order and indexed by sender. Transactions leave the pool when a block
+    including them is connected to the longest chain and come back when
+    that block is disconnected by a reorg.
+    """
+    def __init__(self):
+        self.txns = {}       # txn_id -> Transaction, in arrival order
+        self.by_sender = {}  # sender_id -> {txn_id: Transaction}
+
+    def __len__(self):
+        return len(self.txns)
+
+    def __contains__(self, txn):
+        return txn.txn_id in self.txns
+
+    def __iter__(self):
+        return iter(self.txns.values())
+
+    def add(self, txn):
+        if txn.txn_id in self.txns:
+            return
+        self.txns[txn.txn_id] = txn
+        self.by_sender.setdefault(txn.sender_id, {})[txn.txn_id] = txn
+
+    def discard(self, txn):
+        if self.txns.pop(txn.txn_id, None) is None:
+            return
+        pending = self.by_sender[txn.sender_id]
+        del pending[txn.txn_id]
+        if not pending:
+            del self.by_sender[txn.sender_id]
+
+    def connect_block(self, block):
+        for txn in block.transactions[1:]:
+            self.discard(txn)
+
+    def disconnect_blocks(self, blocks):
+        """
+        Puts the transactions of blocks that left the longest chain back
+        in the pool, ahead of all pending transactions and in chain order.
+        """
+        restored = {}
+        for block in blocks:
+            for txn in block.transactions[1:]:
+                if txn.txn_id not in self.txns:
+                    restored[txn.txn_id] = txn
+                    self.by_sender.setdefault(txn.sender_id, {})[txn.txn_id] = txn
+        if restored:
+            restored.update(self.txns)
+            self.txns = restored
+
+    def select(self, balances, max_txns):
+        """
+        Returns up to max_txns transactions in pool order that can be
+        applied one after the other to balances, updating balances.
+
+        Senders without coins are skipped without reading their balance,
+        and the walk stops as soon as no sender with coins has a pending
+        transaction left, so the tail of the pool is not looked at.
+        """
+        remaining = {sender_id: len(pending) for sender_id, pending in self.by_sender.items()}
+        broke = {sender_id for sender_id in remaining if balances[sender_id] <= 0}
+        funded_pending = sum(count for sender_id, count in remaining.items() if sender_id not in broke)
+
+        selected = []
+        for txn in self.txns.values():
+            if not funded_pending:
+                break
+            sender_id = txn.sender_id
+            remaining[sender_id] -= 1
+            if sender_id in broke:
+                continue
+            funded_pending -= 1
+
+            sender_balance = balances[sender_id]
+            if sender_balance < txn.amount:
+                continue
+            balances[sender_id] = sender_balance - txn.amount
+            balances[txn.recipient_id] += txn.amount
+            selected.append(txn)
+            if len(selected) == max_txns:
+                break
+
+            # A sender that spent all its coins is skipped until it is paid
+            recipient_id = txn.recipient_id
+            if recipient_id in broke:
+                broke.discard(recipient_id)
+                funded_pending += remaining[recipient_id]
+            if sender_balance == txn.amount and sender_id != recipient_id:
+                broke.add(sender_id)
+                funded_pending -= remaining[sender_id]
+        return selected
@@ -0,0 +1,134 @@
+import csv
+import math
+import os
+from array import array
+
+# Propagation metrics collected online while the simulation runs. Peers report
+# the first time they see each block and transaction; block coverage is kept
+# per block ID and latencies go into fixed-size log histograms, so memory does
+# not grow with the number of messages.
+
+COVERAGE = (0.5, 0.9, 1.0)  # Fractions of the peers at which a block's coverage time is recorded
+
+BLOCK_COLUMNS = ["Block ID", "First Seen", "Peers Reached"] + [f"{int(q * 100)}% Coverage" for q in COVERAGE]
+SUMMARY_COLUMNS = ["Metric", "Count", "Mean", "P50", "P90", "P99", "Max"]
+BLOCKS_FILE = "block_propagation.csv"
+SUMMARY_FILE = "propagation_summary.csv"
+
+
+class LogHistogram:
+    """
+    HDR-style histogram of non-negative values: every power of two from
+    2**MIN_EXP to 2**MAX_EXP is split into SUB_BUCKETS linear buckets, so
+    quantiles are exact to within 1 / SUB_BUCKETS of the value. Smaller values
+    count as zero and larger ones are clamped to the last bucket.
+    """
+    MIN_EXP = -20
+    MAX_EXP = 24
+    SUB_BUCKETS = 64
+
+    def __init__(self):
+        self.counts = array('q', bytes(8 * (self.MAX_EXP - self.MIN_EXP) * self.SUB_BUCKETS))
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        mantissa, exponent = math.frexp(value)  # value = mantissa * 2**exponent, 0.5 <= mantissa < 1
+        if value <= 0 or exponent <= self.MIN_EXP:
+            self.zeros += 1
+            return
+        index = (exponent - 1 - self.MIN_EXP) * self.SUB_BUCKETS + int((2 * mantissa - 1) * self.SUB_BUCKETS)
+        self.counts[min(index, len(self.counts) - 1)] += 1
+
+    def bucket_value(self, index):
+        exponent, sub_bucket = divmod(index, self.SUB_BUCKETS)
+        return math.ldexp(1 + (sub_bucket + 0.5) / self.SUB_BUCKETS, exponent + self.MIN_EXP)
+
+    def quantile(self, q):
+        """
+        Returns the middle of the bucket holding the q-quantile, or NaN if
+        nothing was recorded.
+        """
+        if not self.count:
+            return float('nan')
+        rank = max(1, math.ceil(q * self.count)) - self.zeros
+        if rank <= 0:
+            return 0.0
+        for index, count in enumerate(self.counts):
+            rank -= count
+            if rank <= 0:
+                return min(self.bucket_value(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else float('nan')
+
+
+class PropagationMetrics:
+    """
+    Records, for every block, when it was first seen (mined) and when it had
+    reached each COVERAGE fraction of the peers, and keeps histograms of the
+    coverage latencies and of the transaction gossip latency, from creation to
+    the first receipt at each other peer.
+    """
+    def __init__(self, num_peers):
+        self.thresholds = [math.ceil(q * num_peers) for q in COVERAGE]
+        self.first_seen = array('d')
+        self.reached = array('l')
+        self.coverage_times = [array('d') for _ in COVERAGE]
+        self.block_latency = [LogHistogram() for _ in COVERAGE]
+        self.txn_latency = LogHistogram()
+
+    def block_seen(self, block_id, time):
+        if block_id >= len(self.first_seen):
+            missing = block_id + 1 - len(self.first_seen)
+            self.first_seen.extend([time] * missing)
+            self.reached.extend([0] * missing)
+            for times in self.coverage_times:
+                times.extend([float('nan')] * missing)
+
+        reached = self.reached[block_id] + 1
+        self.reached[block_id] = reached
+        for threshold, times, histogram in zip(self.thresholds, self.coverage_times, self.block_latency):
+            if reached == threshold:
+                times[block_id] = time
+                histogram.record(time - self.first_seen[block_id])
+
+    def txn_received(self, transaction, time):
+        self.txn_latency.record(time - transaction.timestamp)
+
+    def block_rows(self):
+        rows = []
+        # The genesis block is known to every peer from the start
+        for block_id in range(1, len(self.first_seen)):
+            first_seen = self.first_seen[block_id]
+            rows.append([block_id, first_seen, self.reached[block_id]]
+                        + [times[block_id] - first_seen for times in self.coverage_times])
+        return rows
+
+    def summary_rows(self):
+        histograms = [(f"Block {int(q * 100)}% coverage", histogram)
+                      for q, histogram in zip(COVERAGE, self.block_latency)]
+        histograms.append(("Transaction latency", self.txn_latency))
+        return [[name, histogram.count, histogram.mean(), histogram.quantile(0.5), histogram.quantile(0.9),
+                 histogram.quantile(0.99), histogram.max] for name, histogram in histograms]
+
+    def write(self, output_dir):
+        """
+        Writes the per-block coverage latencies and the latency summary next
+        to simulation_results.csv. Returns the summary rows.
+        """
+        summary = self.summary_rows()
+        for name, columns, rows in ((BLOCKS_FILE, BLOCK_COLUMNS, self.block_rows()),
+                                    (SUMMARY_FILE, SUMMARY_COLUMNS, summary)):
+            with open(os.path.join(output_dir, name), 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(rows)
+        return summary
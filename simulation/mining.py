@@ -0,0 +1,42 @@
+from bisect import bisect_right
+from itertools import accumulate
+from .event import Event, MINE_BLOCK
+import random
+
+PEER = 'peer'
+ORACLE = 'oracle'
+MODES = (PEER, ORACLE)
+
+
+class MiningOracle:
+    """
+    Samples the next block of the whole network at once instead of keeping
+    one mining timer per peer.
+
+    Every peer always mines, with exponential block times of rate
+    hashing_power / I, and exponential races are memoryless: restarting a
+    peer's timer when its tip changes does not change the distribution of
+    its next success. The next block of the network therefore comes after
+    an exponential time with the summed rate, and is found by each peer
+    with probability proportional to its hashing power. The winner builds
+    its block template on its tip at that moment.
+    """
+    def __init__(self, peers, I):
+        self.peers = peers
+        self.I = I
+        self.cumulative_power = list(accumulate(p.hashing_power for p in peers))
+        self.event = None  # The pending network-wide mining event
+
+        for peer in peers:
+            peer.mining_timer = False
+
+    def schedule(self, current_time, event_queue):
+        total_power = self.cumulative_power[-1]
+        delay = random.expovariate(total_power / self.I)
+        winner = bisect_right(self.cumulative_power, random.random() * total_power)
+        self.event = event_queue.add_event(Event(current_time + delay, MINE_BLOCK, winner))
+
+    # Handler of the network-wide mining event, called with the winning peer
+    def block_found(self, peer, current_time, event_queue, msg):
+        peer.mine_block_callback(current_time, event_queue, peer.create_block_template())
+        self.schedule(current_time, event_queue)
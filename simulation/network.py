@@ -1,13 +1,23 @@
 from .peer import Peer
+from .link import LinkTable
+from .balances import BalanceStore
+from .blockstore import BlockStore
+from .validation import ValidationCache
+from .topology import load_topology, approximate_diameter
+from . import report
 import random
-import networkx as nx
-import matplotlib.pyplot as plt
 
 class Network:
-    def __init__(self, n, z0, z1,I):
+    def __init__(self, n, z0, z1,I, orphan_pool_size=1000, orphan_max_age=None,
+                 topology_seed=None, topology_cache_dir=None, compact_blocks=False, validation_cache=True):
         self.peers = []
-        self.graph = nx.Graph()
-        self.link_params = {}  # Stores (rho, c) for each edge
+        self._graph = None  # networkx view of the topology, built on first use
+        self.adjacency = [[] for _ in range(n)]  # Neighbor lists of the topology
+        self.links = None  # LinkTable with the parameters of every directed edge
+        self.link_params = {}  # Stores the Link (message queue) of each directed edge (i, j)
+        self.block_store = BlockStore()  # Block tree shared by all peers
+        self.balance_store = BalanceStore(n, self.block_store)  # Balances after every block, shared by all peers
+        self.validation_cache = ValidationCache() if validation_cache else None  # Block verdicts shared by all peers
         
         all_ids = list(range(n))
         
@@ -20,7 +30,14 @@ class Network:
                 is_slow=pid in slow_ids,
                 is_low_cpu=pid in low_cpu_ids,
                 link_params=self.link_params,
-                I=I
+                I=I,
+                num_peers=n,
+                block_store=self.block_store,
+                orphan_pool_size=orphan_pool_size,
+                orphan_max_age=orphan_max_age,
+                compact_blocks=compact_blocks,
+                validation_cache=self.validation_cache,
+                balance_store=self.balance_store
             )
             self.peers.append(peer)
 
@@ -34,13 +51,7 @@ class Network:
             peer.known_peer_ids = [pid for pid in all_peer_ids if pid != peer.peer_id]
        
         # Generate connected topology
-        while True: 
-            self.create_random_topology() 
-
-            if nx.is_connected(self.graph): 
-                self.save_graph_as_png()
-                break
-        
+        self.create_random_topology(topology_seed, topology_cache_dir)
         self.set_neighbors()
 
 
@@ -51,37 +62,50 @@ class Network:
     
     def set_neighbors(self):
         for p in self.peers:
-            p.neighbors = list(self.graph.neighbors(p.peer_id))
-    
-    def create_random_topology(self):
-        self.graph.clear()
-        self.graph.add_nodes_from(range(len(self.peers)))
+            p.neighbors = list(self.adjacency[p.peer_id])
+            p.out_links = [self.link_params[(p.peer_id, neighbor)] for neighbor in p.neighbors]
+
+    def create_random_topology(self, seed=None, cache_dir=None):
+        # Degree of every peer is randomly chosen between 3 and 6, and the graph is always connected
+        edges = load_topology(len(self.peers), seed, cache_dir)
+        self._graph = None
+
+        # Directed edge 2k goes from peer to neighbor of edge k, and 2k + 1 back
+        src, dst, rho, c = [], [], [], []
+        for peer, neighbor in edges:
+            self.adjacency[peer].append(neighbor)
+            self.adjacency[neighbor].append(peer)
 
-        for peer in self.graph.nodes:
+            # Initialize link parameters
+            p1, p2 = self.peers[peer], self.peers[neighbor]
+            cij = 100e6 if (not p1.is_slow and not p2.is_slow) else 5e6
+            rhoij = random.uniform(0.01, 0.5)
+            src += (peer, neighbor)
+            dst += (neighbor, peer)
+            rho += (rhoij, rhoij)
+            c += (cij, cij)
 
-            # Degree of peer is randomly chosen between 3 and 6
-            target_degree = random.randint(3, 6)
-            current_degree = self.graph.degree(peer)
+        self.links = LinkTable(src, dst, rho, c, seed=random.getrandbits(64))
+        self.link_params.clear()
+        for link in self.links.links:
+            self.link_params[(link.src, link.dst)] = link
 
-            while current_degree < target_degree:
-                # Nodes with degree <= 6
-                candidates = [n for n in self.graph.nodes if n != peer and not self.graph.has_edge(peer, n) and self.graph.degree(n) < 6]
-                if not candidates: break
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = report.build_graph(self.adjacency)
+        return self._graph
 
-                neighbor = random.choice(candidates)
-                self.graph.add_edge(peer, neighbor)
-                current_degree = self.graph.degree(peer)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_graph'] = None
+        return state
 
-                # Initialize link parameters
-                p1, p2 = self.peers[peer], self.peers[neighbor]
-                cij = 100e6 if (not p1.is_slow and not p2.is_slow) else 5e6 
-                rhoij = random.uniform(0.01, 0.5)
-                self.link_params[(peer, neighbor)] = (rhoij, cij)
-                self.link_params[(neighbor, peer)] = (rhoij, cij) 
+    def diameter(self, exact=False):
+        if exact:
+            import networkx as nx
+            return nx.diameter(self.graph)
+        return approximate_diameter(self.adjacency)
 
-    def save_graph_as_png(self):
-        plt.figure(figsize=(8, 8))
-        nx.draw(self.graph, with_labels=True, node_size=500, node_color="skyblue", font_size=15, font_weight="bold")
-        plt.title("Network Topology")
-        plt.savefig("topology_graph.png")
-        plt.close()
\ No newline at end of file
+    def save_graph_as_png(self, path="topology_graph.png"):
+        report.save_topology_png(self.graph, path)
\ No newline at end of file
@@ -0,0 +1,70 @@
+class OrphanPool:
+    """
+    Blocks whose parent has not been received yet, indexed by the missing
+    parent's ID. The pool holds at most max_size blocks and, if max_age is
+    set, drops blocks that have waited longer than max_age; the oldest
+    blocks are dropped first.
+    """
+    def __init__(self, max_size=1000, max_age=None):
+        self.max_size = max_size
+        self.max_age = max_age
+
+        self.entries = {}    # block_id -> (block, arrival_time), oldest first
+        self.by_parent = {}  # missing parent ID -> [blocks]
+
+        self.hits = 0             # Orphans connected once their parent arrived
+        self.evicted = 0          # Orphans dropped by the size or age bound
+        self.max_resolution_depth = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, block_id):
+        return block_id in self.entries
+
+    def add(self, block, current_time):
+        if block.id in self.entries:
+            return
+
+        self.expire(current_time)
+        if len(self.entries) >= self.max_size:
+            self.evict(next(iter(self.entries)))
+
+        self.entries[block.id] = (block, current_time)
+        self.by_parent.setdefault(block.prev_id, []).append(block)
+
+    def expire(self, current_time):
+        if self.max_age is None:
+            return
+        while self.entries:
+            block_id, (_, arrival_time) = next(iter(self.entries.items()))
+            if current_time - arrival_time <= self.max_age:
+                break
+            self.evict(block_id)
+
+    def evict(self, block_id):
+        block, _ = self.entries.pop(block_id)
+        siblings = self.by_parent[block.prev_id]
+        siblings.remove(block)
+        if not siblings:
+            del self.by_parent[block.prev_id]
+        self.evicted += 1
+
+    def pop_children(self, parent_id, current_time):
+        """
+        Removes and returns the orphans waiting for parent_id. Orphans past
+        max_age are dropped first, so the age bound also holds when no new
+        orphans arrive.
+        """
+        self.expire(current_time)
+        children = self.by_parent.pop(parent_id, None)
+        if children is None:
+            return []
+        for block in children:
+            del self.entries[block.id]
+        self.hits += len(children)
+        return children
+
+    def record_resolution(self, depth):
+        if depth > self.max_resolution_depth:
+            self.max_resolution_depth = depth
@@ -1,103 +1,119 @@
 from simulation.transaction import Transaction
-from simulation.event import Event
-from simulation.block import Block
+from simulation.event import Event, GENERATE_TXN, RECEIVE_TXN, MINE_BLOCK, RECEIVE_BLOCK
+from simulation.event import CMPCT_BLOCK, GET_BLOCK_TXN, BLOCK_TXN
+from simulation.block import Block, GENESIS_ID
+from simulation.blockstore import BlockView
+from simulation.balances import BalanceStore, BalanceOverlay, block_delta
+from simulation.mempool import Mempool
+from simulation.orphans import OrphanPool
+from simulation import chain_export, relay, trace
 from collections import defaultdict
 import copy
+import os
 import random
 
 class Peer:
-    def __init__(self,is_low_cpu,is_slow,I,peer_id, link_params):
+    def __init__(self,is_low_cpu,is_slow,I,peer_id, link_params, num_peers, block_store,
+                 orphan_pool_size=1000, orphan_max_age=None, compact_blocks=False, validation_cache=None,
+                 balance_store=None):
         self.peer_id = peer_id
         self.is_low_cpu = is_low_cpu
         self.is_slow = is_slow  
         self.I = I
+        self.Ttx = None
         
         self.known_peer_ids = []
         self.neighbors = []
+        self.out_links = []  # Outgoing Link to each neighbor, in the same order
         
         self.received_txns = set()
-        self.mempool = set()
+        self.mempool = Mempool()
         self.sent_transactions = defaultdict(set)
 
-        self.balances = defaultdict(int)
-        self.balance_cache = {}  # Cache computed balances for blocks
+        self.block_store = block_store  # Block tree shared by all peers
+        self.block_view = BlockView()   # Blocks this peer has seen and their arrival times
+        # Balances after every block of the tree, normally shared by all peers (see Network)
+        self.balance_store = balance_store if balance_store is not None else BalanceStore(num_peers, block_store)
 
-        genesis_blk = Block(
-            prev_id=None,
-            transactions=[],
-            miner_id="GENESIS"
-        )
-        genesis_blk.id = "GENESIS"
-
-        self.block_tree = {
-            genesis_blk.id: {
-                'block': genesis_blk,
-                'parent': None,
-                'children': [],
-                'depth': 0,
-                'arrival_time': 0
-            }
-        }
-        self.orphaned_blks={}
+        genesis_blk = block_store.genesis
+        self.block_view.add(genesis_blk.id, 0)
+        self.balance_store.add_block(genesis_blk.id, {})
+        self.balances = self.balance_store.balances(genesis_blk.id).copy()  # Balances at the longest chain tip
+
+        self.orphan_pool = OrphanPool(orphan_pool_size, orphan_max_age)  # Blocks waiting for their parent
+        self.validation_cache = validation_cache  # Shared ValidationCache, or None to validate every block
         self.longest_chain_tip = genesis_blk
 
         self.current_mining_event = None
+        self.mining_timer = True  # Whether the peer schedules its own mining events (see mining.MiningOracle)
         self.total_blocks_mined = 0
 
         self.sent_blocks = defaultdict(set)
+
+        self.compact_blocks = compact_blocks  # Relay blocks as compact blocks
+        self.pending_blocks = set()  # Compact blocks waiting for their missing transactions
+        self.relay_stats = relay.CompactRelayStats()
         
         self.hashing_power = 0
         
         self.longest_chain_txns = set()  # Stores transaction IDs in the longest chain
+        self.chain_writer = None  # ChainWriter that follows the longest chain during the run, if any
         
         self.link_params = link_params
         self.peers = []
+        self.trace = trace.NULL_TRACER
+        self.metrics = None  # PropagationMetrics shared by all peers, set by the Simulator
+
+    def __getstate__(self):
+        # Tracers hold a writer thread; checkpoints are restored without one
+        state = self.__dict__.copy()
+        state['trace'] = trace.NULL_TRACER
+        return state
+
+    # Deliver the message at the head of an incoming link
+    def receive_from_link(self, current_time, event_queue, link):
+        kind, msg = link.pop(event_queue)
+        if kind == RECEIVE_TXN:
+            self.receive_transaction(current_time, event_queue, msg)
+        elif kind == RECEIVE_BLOCK:
+            self.receive_block(current_time, event_queue, msg)
+        elif kind == CMPCT_BLOCK:
+            self.receive_compact_block(current_time, event_queue, msg, link.src)
+        elif kind == GET_BLOCK_TXN:
+            self.send_block_txns(current_time, event_queue, msg, link.src)
+        else:
+            self.receive_block_txns(current_time, event_queue, msg)
 
-    def calculate_latency(self, peer_id, msg_bits):
-        link = (self.peer_id, peer_id)
-        rho, c = self.link_params[link]
-        
-        mean_d = 96000 / c
-        d = random.expovariate(1 / mean_d)
-        
-        return rho + (msg_bits / c) + d
-    
     # --------------------------------------------------------
     # Transaction logic
     # --------------------------------------------------------
 
     def schedule_transactions(self,event_queue,Ttx):
-        event = Event(timestamp=0,
-                    callback=self.generate_transaction_handler(Ttx))
-        event_queue.add_event(event)
+        self.Ttx = Ttx
+        event_queue.add_event(Event(0, GENERATE_TXN, self.peer_id))
 
     # Periodically generate random transactions
-    def generate_transaction_handler(self, Ttx):
-        def handler(current_time, event_queue, event):
-            sender_balance = self.balances.get(self.peer_id,0)
-
-            if sender_balance > 0:
-                amount = random.randint(1, sender_balance)
-                recipient = random.choice([
-                    pid for pid in self.known_peer_ids if pid != self.peer_id
-                ])
-                transaction = Transaction(self.peer_id, recipient, amount)
-                
-                event.msg = transaction
-                self.receive_transaction(current_time, event_queue, event)
-                
-                print(f"Time {current_time:.2f}: Peer {self.peer_id} generated {transaction}")
-            
-            # Schedule the next transaction after a delay
-            delay = random.expovariate(1.0 / Ttx)
-            event_queue.add_event(Event(
-                current_time + delay,
-                self.generate_transaction_handler(Ttx)
-            ))
-        return handler
-    
-    def receive_transaction(self, current_time, event_queue, event):
-        transaction = event.msg
+    def generate_transaction(self, current_time, event_queue, msg):
+        sender_balance = int(self.balances[self.peer_id])
+
+        if sender_balance > 0:
+            amount = random.randint(1, sender_balance)
+            recipient = random.choice([
+                pid for pid in self.known_peer_ids if pid != self.peer_id
+            ])
+            transaction = Transaction(self.peer_id, recipient, amount, timestamp=current_time)
+
+            self.receive_transaction(current_time, event_queue, transaction)
+
+            if self.trace.level >= trace.TRANSACTIONS:
+                self.trace.record(current_time, trace.TXN_GENERATED, self.peer_id,
+                                  transaction.txn_id, recipient, amount)
+
+        # Schedule the next transaction after a delay
+        delay = random.expovariate(1.0 / self.Ttx)
+        event_queue.add_event(Event(current_time + delay, GENERATE_TXN, self.peer_id))
+
+    def receive_transaction(self, current_time, event_queue, transaction):
         sender_id = transaction.sender_id
 
         if not transaction or not sender_id:
@@ -109,28 +125,36 @@ class Peer:
         if transaction.txn_id not in self.received_txns:
             self.received_txns.add(transaction.txn_id)
             self.mempool.add(transaction)
+            if self.metrics is not None and sender_id != self.peer_id:
+                self.metrics.txn_received(transaction, current_time)
 
             # Forward to all connected peers except the one who sent it:
-            for neighbor in self.neighbors:
+            for neighbor, link in zip(self.neighbors, self.out_links):
                 if neighbor != sender_id and neighbor not in self.sent_transactions[transaction.txn_id]:
-                    # Calculate latency
                     msg_bits = transaction.size * 8
-                    latency = self.calculate_latency(neighbor, msg_bits)
-                    
-                    event_queue.add_event(Event(
-                        timestamp=current_time + latency,
-                        callback=self.peers[neighbor].receive_transaction,
-                        msg=transaction
-                    ))
+                    link.send(current_time, event_queue, RECEIVE_TXN, transaction, msg_bits)
                     self.sent_transactions[transaction.txn_id].add(neighbor)
     
     # --------------------------------------------------------
     # Mining logic
     # --------------------------------------------------------
     def schedule_mining(self, current_time, event_queue):
-        if self.current_mining_event:
+        if self.current_mining_event or not self.mining_timer:
             return
+
+        new_block = self.create_block_template()
+
+        # Calculate Tk
+        mean_time = self.I / self.hashing_power
+        Tk = random.expovariate(1.0 / mean_time)
         
+        # Schedule the event of mine_block_callback at current_time + Tk
+        self.current_mining_event = event_queue.add_event(Event(
+            current_time + Tk, MINE_BLOCK, self.peer_id, new_block
+        ))
+
+    # Block on the current tip with a coinbase and transactions from the mempool
+    def create_block_template(self):
         # Create the block
         new_block = Block(
         prev_id=self.longest_chain_tip.id,
@@ -147,74 +171,35 @@ class Peer:
 
         new_block.transactions.append(coinbase_tx)
 
-        temp_balances = self.balances.copy()
+        temp_balances = BalanceOverlay(self.balances)
         temp_balances[self.peer_id] += 50
 
-        for txn in list(self.mempool):
-            if self.transaction_in_longest_chain(txn):
-                continue
-
-            if txn.coinbase:
-                temp_balances[txn.sender_id] += txn.amount
-            else:
-                if temp_balances[txn.sender_id] < txn.amount:
-                    continue
-                temp_balances[txn.sender_id] -= txn.amount
-                temp_balances[txn.recipient_id] += txn.amount
-
-            new_block.transactions.append(txn)
-
-            if not new_block.is_valid_size():
-                new_block.transactions.pop()
-                break
-        
-
-        # Calculate Tk
-        mean_time = self.I / self.hashing_power
-        Tk = random.expovariate(1.0 / mean_time)
-        
-        self.current_mining_event = Event(
-            timestamp=current_time+Tk,
-            callback=self.mine_block_callback,
-            msg=new_block
-        )
-        # Schedule the event of mine_block_callback at current_time + Tk
-        event_queue.add_event(self.current_mining_event)
+        # The mempool only holds transactions that are not in the longest chain
+        max_txns = Block.MAX_SIZE // Transaction.size - 1
+        new_block.transactions.extend(self.mempool.select(temp_balances, max_txns))
+        return new_block
     
         
-    def mine_block_callback(self, current_time, event_queue, event):
-        if event != self.current_mining_event:
-            return
-        
-        mined_block = event.msg
+    def mine_block_callback(self, current_time, event_queue, mined_block):
+        # Mining events of abandoned tips are cancelled, so this is always the current one
         self.current_mining_event = None
         
-        # Add the node to the block tree
-        parent_block = self.block_tree[mined_block.prev_id]
-        new_depth = parent_block['depth'] + 1
-        self.block_tree[mined_block.id] = {
-            'block': mined_block,
-            'parent': mined_block.prev_id,
-            'children': [],
-            'depth': new_depth,
-            'arrival_time': current_time
-        }
-
-        print(f"Block mined by peer {self.peer_id} at time {current_time}s")
-        parent_block['children'].append(mined_block.id)
-        
-        if mined_block.prev_id == self.longest_chain_tip.id:
-            self.extend_longest_chain(mined_block)
-        else:
-            self.update_longest_chain(mined_block.id)
-            
+        # Add the block to the shared block tree and to this peer's view
+        block_id = self.block_store.add(mined_block)
+        self.block_view.add(block_id, current_time)
+        if self.metrics is not None:
+            self.metrics.block_seen(block_id, current_time)
+        delta = block_delta(mined_block)
+        self.balance_store.add_block(block_id, delta)
+        if self.validation_cache is not None:
+            self.validation_cache.put(block_id, True, delta)
+
+        if self.trace.level >= trace.BLOCKS:
+            self.trace.record(current_time, trace.BLOCK_MINED, self.peer_id,
+                              block_id, mined_block.prev_id, len(mined_block.transactions))
+
         # Update the longest tip
-        self.update_canonical_chain(mined_block.id)
-        
-        # Remove those transactions from the mempool that have been included
-        for tx in mined_block.transactions[1:]:
-            if tx in self.mempool:
-                self.mempool.remove(tx)
+        self.update_canonical_chain(block_id)
         
         self.total_blocks_mined += 1
 
@@ -224,162 +209,169 @@ class Peer:
 
     
     def broadcast_block(self, new_block, current_time, event_queue):
-        for neighbor in self.neighbors:
+        for neighbor, link in zip(self.neighbors, self.out_links):
             if new_block.id in self.sent_blocks[neighbor]:
                 continue  # Already sent, skip
             
-            msg_bits = new_block.size * 8
-            latency = self.calculate_latency(neighbor, msg_bits)
-            event_queue.add_event(Event(
-                timestamp=current_time + latency,
-                callback=self.peers[neighbor].receive_block,
-                msg=new_block
-            ))
+            if self.compact_blocks:
+                msg_bits = relay.compact_block_size(new_block) * 8
+                link.send(current_time, event_queue, CMPCT_BLOCK, new_block, msg_bits)
+            else:
+                msg_bits = new_block.size * 8
+                link.send(current_time, event_queue, RECEIVE_BLOCK, new_block, msg_bits)
             self.sent_blocks[neighbor].add(new_block.id)
     
     
     def transaction_in_longest_chain(self, txn):
         return txn.txn_id in self.longest_chain_txns # O(1) lookup
 
-    def extend_longest_chain(self, new_block):
-         for tx in new_block.transactions:
-             self.longest_chain_txns.add(tx.txn_id)
-
-    def update_longest_chain(self, new_tip_id):
-        self.longest_chain_txns.clear()  
-        current_block_id = new_tip_id
-
-        while current_block_id and current_block_id != "GENESIS":
-            block = self.block_tree[current_block_id]['block']
+    def connect_block(self, block_id):
+        block = self.block_store.blocks[block_id]
+        for tx in block.transactions:
+            self.longest_chain_txns.add(tx.txn_id)
+        for account, change in self.balance_store.deltas[block_id].items():
+            self.balances[account] += change
+        self.mempool.connect_block(block)
+        if self.chain_writer:
+            self.chain_writer.append(block)
+
+    def disconnect_blocks(self, block_ids):
+        blocks = [self.block_store.blocks[block_id] for block_id in block_ids]
+        for block_id, block in zip(reversed(block_ids), reversed(blocks)):
             for tx in block.transactions:
-                self.longest_chain_txns.add(tx.txn_id)  
-            current_block_id = block.prev_id
+                self.longest_chain_txns.discard(tx.txn_id)
+            for account, change in self.balance_store.deltas[block_id].items():
+                self.balances[account] -= change
+        self.mempool.disconnect_blocks(blocks)
+        if self.chain_writer:
+            self.chain_writer.truncate(self.block_store.depth[block_ids[0]] - 1)
 
     
-    def receive_block(self,current_time, event_queue,event):
-        block = event.msg
-        if block.id in self.block_tree:
+    def receive_block(self, current_time, event_queue, block):
+        if block.id in self.block_view or block.id in self.orphan_pool:
             return
 
-        parent_id = block.prev_id
-        if parent_id not in self.block_tree:
-            self.orphaned_blks[block.id] = block  # Store in dict
+        if block.prev_id not in self.block_view:
+            self.orphan_pool.add(block, current_time)
             return
-        
-        if not self.validate_block(block):
+
+        if self.accept_block(current_time, event_queue, block):
+            self.process_orphan_blocks(current_time, event_queue, block.id)
+
+    # --------------------------------------------------------
+    # Compact block relay
+    # --------------------------------------------------------
+
+    # Rebuild a block announced by short IDs, fetching the unknown transactions from the sender
+    def receive_compact_block(self, current_time, event_queue, block, sender_id):
+        block_id = block.id
+        if block_id in self.block_view or block_id in self.orphan_pool or block_id in self.pending_blocks:
             return
-        
-        if self.current_mining_event and block.prev_id == self.longest_chain_tip.id:
-            self.current_mining_event = None
-        
 
-        # Insert the block to block tree
-        parent_node = self.block_tree[parent_id]
-        new_depth = parent_node['depth'] + 1
-        
-        self.block_tree[block.id] = {
-            'block': block,
-            'parent': parent_id,
-            'children': [],
-            'depth': new_depth,
-            'arrival_time': current_time
-        }
-        parent_node['children'].append(block.id)
-
-        if new_depth > self.block_tree[self.longest_chain_tip.id]['depth']:
-            if parent_id == self.longest_chain_tip.id:
-                self.extend_longest_chain(block)
-            else:
-                self.update_longest_chain(block.id)
-                
-            self.update_canonical_chain(block.id)
-            for tx in block.transactions[1:]:
-                if tx in self.mempool:
-                    self.mempool.remove(tx)
-            
+        stats = self.relay_stats
+        stats.blocks += 1
+        stats.full_bytes += block.size
+        stats.relay_bytes += relay.compact_block_size(block)
+        stats.txns += len(block.transactions) - 1
+
+        # The coinbase is sent in full
+        received_txns = self.received_txns
+        missing = [i for i, tx in enumerate(block.transactions) if i and tx.txn_id not in received_txns]
+        if not missing:
+            stats.reconstructed += 1
+            self.receive_block(current_time, event_queue, block)
+            return
+
+        stats.missing_txns += len(missing)
+        stats.relay_bytes += relay.get_block_txn_size(missing)
+        self.pending_blocks.add(block_id)
+        link = self.link_params[(self.peer_id, sender_id)]
+        link.send(current_time, event_queue, GET_BLOCK_TXN, (block, missing),
+                  relay.get_block_txn_size(missing) * 8)
+
+    def send_block_txns(self, current_time, event_queue, request, requester_id):
+        block, missing = request
+        link = self.link_params[(self.peer_id, requester_id)]
+        link.send(current_time, event_queue, BLOCK_TXN, request, relay.block_txn_size(missing) * 8)
+
+    def receive_block_txns(self, current_time, event_queue, response):
+        block, missing = response
+        self.relay_stats.relay_bytes += relay.block_txn_size(missing)
+        self.pending_blocks.discard(block.id)
+        self.receive_block(current_time, event_queue, block)
+
+    # Validate a block whose parent is known and add it to the block tree
+    def accept_block(self, current_time, event_queue, block):
+        block_id = block.id
+
+        cache = self.validation_cache
+        result = cache.get(block_id) if cache is not None else None
+        if result is None:
+            is_valid = self.validate_block(block)
+            result = (is_valid, block_delta(block) if is_valid else None)
+            if cache is not None:
+                cache.put(block_id, *result)
+
+        is_valid, delta = result
+        if not is_valid:
+            return False
+
+        # Insert the block to this peer's view of the block tree
+        self.block_view.add(block_id, current_time)
+        if self.metrics is not None:
+            self.metrics.block_seen(block_id, current_time)
+        self.balance_store.add_block(block_id, delta)
+
+        depth = self.block_store.depth
+        if depth[block_id] > depth[self.longest_chain_tip.id]:
+            # Stop mining on the old tip, whichever branch the new one is on
+            if self.current_mining_event:
+                self.current_mining_event.cancel()
+                self.current_mining_event = None
+            self.update_canonical_chain(block_id)
             self.schedule_mining(current_time, event_queue)
-        else:
-            self.balance_cache[block.id] = self.calculate_balances_for_chain(block.id)
-        
-        self.process_orphan_blocks(current_time,event_queue)
 
         self.broadcast_block(block,current_time,event_queue)
+        return True
     
-    def find_common_ancestor(self, old_tip_id, new_tip_id):
-        old_chain = set()
-        current = old_tip_id
-        while current:
-            old_chain.add(current)
-            current = self.block_tree[current]['parent']
-        
-        current = new_tip_id
-        while current:
-            if current in old_chain:
-                return current
-            current = self.block_tree[current]['parent']
-        return None 
-
-    def calculate_balances_for_chain_from(self, fork_point_id, tip_id):
-        if fork_point_id in self.balance_cache:
-            balances = self.balance_cache[fork_point_id].copy()
+    def find_common_ancestor(self, old_tip, new_tip):
+        return self.block_store.common_ancestor(old_tip, new_tip)
+
+    def update_canonical_chain(self, new_tip):
+        """
+        Moves the longest chain tip to new_tip. Only the blocks between the
+        fork point and the old and new tips are undone and redone on the
+        transaction index, the tip balances and the mempool.
+        """
+        old_tip = self.longest_chain_tip.id
+
+        if self.block_store.parent[new_tip] == old_tip:
+            self.connect_block(new_tip)
         else:
-            balances = defaultdict(int)
-        
-        chain_segment = []
-        current = tip_id
-        while current and current != fork_point_id:
-            chain_segment.append(current)
-            current = self.block_tree[current]['parent']
-        chain_segment.reverse() 
-        
-        for block_id in chain_segment:
-            block = self.block_tree[block_id]['block']
-            for tx in block.transactions:
-                if tx.coinbase:
-                    balances[tx.recipient_id] += tx.amount
-                else:
-                    balances[tx.sender_id] -= tx.amount
-                    balances[tx.recipient_id] += tx.amount
+            fork_point = self.find_common_ancestor(old_tip, new_tip)
+            self.disconnect_blocks(self.block_store.chain(old_tip, fork_point))
+            for block_id in self.block_store.chain(new_tip, fork_point):
+                self.connect_block(block_id)
 
-            self.balance_cache[block_id] = balances.copy()
-        
-        return balances
-    
-    def update_canonical_chain(self, new_tip_id):
-        old_tip_id = self.longest_chain_tip.id
-
-        fork_point = self.find_common_ancestor(old_tip_id, new_tip_id)
-        
-        new_balances = self.calculate_balances_for_chain_from(fork_point, new_tip_id)
-        
-        self.balances = new_balances
-        self.longest_chain_tip = self.block_tree[new_tip_id]['block']
+        self.longest_chain_tip = self.block_store.blocks[new_tip]
 
-    
-    def process_orphan_blocks(self, current_time, event_queue):
-        orphaned_block_ids = list(self.orphaned_blks.keys())
+    # Connect the orphans descending from a newly accepted block
+    def process_orphan_blocks(self, current_time, event_queue, parent_id):
+        work = [(parent_id, 0)]
 
-        for orphan_id in orphaned_block_ids:
-            orphan_block = self.orphaned_blks[orphan_id]
-            parent_id = orphan_block.prev_id
+        while work:
+            parent_id, depth = work.pop()
+            for orphan_block in self.orphan_pool.pop_children(parent_id, current_time):
+                if self.accept_block(current_time, event_queue, orphan_block):
+                    self.orphan_pool.record_resolution(depth + 1)
+                    work.append((orphan_block.id, depth + 1))
 
-            if parent_id in self.block_tree:
-                del self.orphaned_blks[orphan_id] 
-
-                event = type('', (), {})()
-                event.msg = orphan_block
-                self.receive_block(current_time, event_queue, event)
-
-        
     
     def validate_block(self, block):
         if not block.is_valid_size():
             return False
 
-        if block.prev_id == "GENESIS":
-            balances = defaultdict(int)
-        else:
-            balances = self.balance_cache[block.prev_id].copy()
+        balances = BalanceOverlay(self.balance_store.balances(block.prev_id))
         
         for tx in block.transactions:
             sender_bal = balances[tx.sender_id]
@@ -394,56 +386,18 @@ class Peer:
         return True
         
     
-    def calculate_balances_for_chain(self, tip_id):
-        if tip_id in self.balance_cache:
-            return self.balance_cache[tip_id]
-
-        balances = defaultdict(int)
-        current_block_id = tip_id
-        chain_segment = []
-
-        while current_block_id and current_block_id != "GENESIS":
-            if current_block_id in self.balance_cache:
-                balances = self.balance_cache[current_block_id].copy()
-                break
-            chain_segment.append(current_block_id)
-            current_block_id = self.block_tree[current_block_id]['parent']
-
-        for block_id in reversed(chain_segment):
-            bobj = self.block_tree[block_id]['block']
-            for tx in bobj.transactions:
-                balances[tx.recipient_id] += tx.amount
-                if tx.sender_id != tx.recipient_id:
-                    balances[tx.sender_id] -= tx.amount
-
-            self.balance_cache[block_id] = balances.copy()
-
-        
-        return balances
-    
+    def export_chain(self, path):
+        """
+        Writes the longest chain to a chain export at path (see chain_export).
+        """
+        writer = chain_export.ChainWriter(path)
+        blocks = self.block_store.blocks
+        for block_id in self.block_store.chain(self.longest_chain_tip.id, GENESIS_ID):
+            writer.append(blocks[block_id])
+        writer.close()
 
     def export_included_transactions(self,file_name):
-        chain_blocks = []
-        current_block_id = self.longest_chain_tip.id
-        
-        # Traverse backwards until we reach the genesis block
-        while current_block_id and current_block_id != "GENESIS":
-            block = self.block_tree[current_block_id]['block']
-            chain_blocks.append(block)
-            current_block_id = self.block_tree[current_block_id]['parent']
-        
-        # Reverse the list to have blocks in chronological order
-        chain_blocks.reverse()
-        
-        # Write the transactions from each block to the file.
-        with open(file_name, "w") as outfile:
-            for block in chain_blocks:
-                outfile.write(f"Block ID: {block.id}, Miner: {block.miner_id}\n")
-                outfile.write("Transactions:\n")
-                for txn in block.transactions:
-                    outfile.write(f"    {str(txn)}\n")
-                outfile.write("\n")
-    
-
-
-
+        # The text is rendered from a chain export written next to it
+        path = os.path.splitext(file_name)[0]
+        self.export_chain(path)
+        chain_export.render_text(chain_export.ChainReader(path), file_name)
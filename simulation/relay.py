@@ -0,0 +1,56 @@
+from .transaction import Transaction
+
+# Wire sizes in bytes of the compact block relay messages. A compact block
+# carries the header, a short ID per transaction and the coinbase in full,
+# since no receiver can have it in its mempool.
+HEADER_SIZE = 80
+SHORT_ID_SIZE = 6
+
+
+def compact_block_size(block):
+    return HEADER_SIZE + SHORT_ID_SIZE * (len(block.transactions) - 1) + Transaction.size
+
+
+def get_block_txn_size(missing):
+    return HEADER_SIZE + SHORT_ID_SIZE * len(missing)
+
+
+def block_txn_size(missing):
+    return HEADER_SIZE + Transaction.size * len(missing)
+
+
+class CompactRelayStats:
+    """
+    Compact block relay counters of one receiving peer.
+    """
+    __slots__ = ('blocks', 'reconstructed', 'txns', 'missing_txns', 'full_bytes', 'relay_bytes')
+
+    def __init__(self):
+        self.blocks = 0          # New blocks received as compact blocks
+        self.reconstructed = 0   # ... rebuilt from the mempool without a round trip
+        self.txns = 0            # Transactions announced by short ID
+        self.missing_txns = 0    # ... that had to be fetched
+        self.full_bytes = 0      # Bytes the same messages would take as full blocks
+        self.relay_bytes = 0     # Bytes actually received and requested
+
+    def add(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+def summarize(peers):
+    """
+    Aggregates the compact relay counters of all peers into the
+    reconstruction hit rate and the bytes saved per block.
+    """
+    total = CompactRelayStats()
+    for peer in peers:
+        total.add(peer.relay_stats)
+
+    blocks = max(total.blocks, 1)
+    return {
+        'blocks': total.blocks,
+        'hit_rate': total.reconstructed / blocks,
+        'missing_txn_rate': total.missing_txns / max(total.txns, 1),
+        'bytes_saved_per_block': (total.full_bytes - total.relay_bytes) / blocks,
+    }
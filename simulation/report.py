@@ -0,0 +1,37 @@
+import csv
+
+# Output layer. pandas, networkx and matplotlib are imported only when a
+# table or plot is actually produced, so headless runs never load them.
+
+COLUMNS = ["Node No", "Hashing Power", "Speed", "Blocks Mined", "Blocks in Longest Chain", "Ratio"]
+
+
+def write_statistics_csv(rows, path, columns=COLUMNS):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def statistics_table(rows, columns=COLUMNS):
+    import pandas as pd
+    return pd.DataFrame(rows, columns=columns)
+
+
+def build_graph(adjacency):
+    import networkx as nx
+    graph = nx.Graph()
+    graph.add_nodes_from(range(len(adjacency)))
+    graph.add_edges_from((u, v) for u, neighbors in enumerate(adjacency) for v in neighbors if u < v)
+    return graph
+
+
+def save_topology_png(graph, path="topology_graph.png"):
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    plt.figure(figsize=(8, 8))
+    nx.draw(graph, with_labels=True, node_size=500, node_color="skyblue", font_size=15, font_weight="bold")
+    plt.title("Network Topology")
+    plt.savefig(path)
+    plt.close()
@@ -1,41 +1,224 @@
 from .event import EventQueue
-from .event import Event
+from .event import GENERATE_TXN, RECEIVE_TXN, MINE_BLOCK, RECEIVE_BLOCK, LINK_DELIVERY
+from .peer import Peer
+from .mining import MiningOracle, PEER, ORACLE
+from .block import GENESIS_ID, format_block_id
+from .trace import NULL_TRACER
+from .transaction import Transaction
+from . import archive, chain_export, metrics, report
 import os
-import pandas as pd
+import pickle
+import random
 from collections import defaultdict
 
 
 class Simulator:
-    def __init__(self, network, Ttx, I, max_time):
+    def __init__(self, network, Ttx, I, max_time, tracer=NULL_TRACER, output_dir=".", mining=PEER):
         self.network = network
+        self.output_dir = output_dir  # Where the block trees and results are written
+        self.tracer = tracer
+        self.metrics = metrics.PropagationMetrics(len(network.peers))
+        for peer in network.peers:
+            peer.trace = tracer
+            peer.metrics = self.metrics
         self.Ttx = Ttx
         self.I = I
         self.max_time = max_time
         self.event_queue = EventQueue()
+        self.events_processed = 0
+        self.current_time = 0  # Simulated time up to which all events are processed
+
+        self.checkpoint_path = None
+        self.checkpoint_interval = None
+        self.next_checkpoint = None
+
+        # Dispatch table indexed by event type code
+        self.handlers = [None] * 5
+        self.handlers[GENERATE_TXN] = Peer.generate_transaction
+        self.handlers[RECEIVE_TXN] = Peer.receive_transaction
+        self.handlers[MINE_BLOCK] = Peer.mine_block_callback
+        self.handlers[RECEIVE_BLOCK] = Peer.receive_block
+        self.handlers[LINK_DELIVERY] = Peer.receive_from_link
+
+        # With the oracle, a single network-wide event replaces the per-peer mining events
+        self.mining_oracle = None
+        if mining == ORACLE:
+            self.mining_oracle = MiningOracle(network.peers, I)
+            self.handlers[MINE_BLOCK] = self.mining_oracle.block_found
+        elif mining != PEER:
+            raise ValueError(f"Unknown mining mode: {mining}")
     
     def initialize_events(self):
         for peer in self.network.peers:
             peer.schedule_transactions(self.event_queue, self.Ttx)
             peer.schedule_mining(0, self.event_queue)
+        if self.mining_oracle:
+            self.mining_oracle.schedule(0, self.event_queue)
     
-    def run(self):
-        while (event := self.event_queue.next_event()) is not None:
-            if event.timestamp > self.max_time:
+    def run(self, verbose=True, headless=False, text_trees=False):
+        """
+        Runs the simulation and writes its outputs. A headless run writes
+        raw data only: the block tree archive and the statistics as plain
+        CSV, without rendering the topology or loading pandas. text_trees
+        also writes each peer's block tree as a text file. The propagation
+        metrics are written next to the statistics in both cases. Returns
+        the statistics rows (see report.COLUMNS).
+        """
+        self.process_events()
+        self.tracer.close()
+        for peer in self.network.peers:
+            if peer.chain_writer:
+                peer.chain_writer.close()
+        self.save_blockchain_archive()
+        if text_trees:
+            self.save_blockchain_trees()
+
+        rows = self.statistics_rows()
+        if headless:
+            report.write_statistics_csv(rows, os.path.join(self.output_dir, "simulation_results.csv"))
+        else:
+            self.network.save_graph_as_png(os.path.join(self.output_dir, "topology_graph.png"))
+            self.generate_statistics_table(verbose, rows)
+
+        summary = self.metrics.write(self.output_dir)
+        if verbose:
+            print("\nPropagation latency (seconds):")
+            for name, count, mean, p50, p90, p99, max_latency in summary:
+                print(f"  {name}: {count} samples, mean {mean:.3f}, p50 {p50:.3f}, p90 {p90:.3f}, "
+                      f"p99 {p99:.3f}, max {max_latency:.3f}")
+        return rows
+
+    def process_events(self):
+        while True:
+            if self.checkpoint_path is None:
+                until = self.max_time
+            else:
+                until = min(self.max_time, self.next_checkpoint)
+
+            self.process_events_until(until)
+            self.current_time = until
+            if until >= self.max_time or not self.event_queue:
                 break
-            event.callback(event.timestamp, self.event_queue, event)
-        
-        self.save_blockchain_trees()
-        self.generate_statistics_table()
-        
+
+            self.save_checkpoint(self.checkpoint_path)
+            self.next_checkpoint += self.checkpoint_interval
+
+    def process_events_until(self, until):
+        event_queue = self.event_queue
+        peers = self.network.peers
+        handlers = self.handlers
+        processed = 0
+
+        while (event := event_queue.next_event_until(until)) is not None:
+            handlers[event.kind](peers[event.peer_id], event.timestamp, event_queue, event.msg)
+            processed += 1
+
+        self.events_processed += processed
+
+    # --------------------------------------------------------
+    # Checkpoints
+    # --------------------------------------------------------
+
+    def enable_checkpoints(self, path, interval):
+        """
+        Saves a checkpoint to path every interval seconds of simulated time.
+        """
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval
+        self.next_checkpoint = (self.current_time // interval + 1) * interval
+
+    def enable_chain_export(self, directory, peer_ids):
+        """
+        Streams the longest chain of each of the given peers to the chain
+        export directory/peer_<id> while the simulation runs.
+        """
+        os.makedirs(directory, exist_ok=True)
+        blocks = self.network.block_store.blocks
+        for peer_id in peer_ids:
+            peer = self.network.peers[peer_id]
+            peer.chain_writer = chain_export.ChainWriter(os.path.join(directory, f"peer_{peer_id}"))
+            for block_id in self.network.block_store.chain(peer.longest_chain_tip.id, GENESIS_ID):
+                peer.chain_writer.append(blocks[block_id])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['tracer'] = NULL_TRACER
+        return state
+
+    def save_checkpoint(self, path):
+        """
+        Saves the full simulation state between two events: the event queue,
+        the network and peers, the RNG state and the ID counters.
+        """
+        state = {
+            'simulator': self,
+            'random_state': random.getstate(),
+            'next_txn_id': Transaction.next_id,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load_checkpoint(path, tracer=NULL_TRACER, chain_export_dir=None):
+        """
+        Restores a simulator saved by save_checkpoint. Running it continues
+        exactly where the checkpoint was taken. Checkpointing is off in the
+        restored simulator, so that branching from the file never overwrites
+        it; call enable_checkpoints to turn it back on. Chain exports are
+        continued in place, or in chain_export_dir if given, which leaves the
+        exports of the original run untouched (see ChainWriter.reopen).
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+
+        random.setstate(state['random_state'])
+        Transaction.next_id = state['next_txn_id']
+
+        simulator = state['simulator']
+        simulator.tracer = tracer
+        simulator.checkpoint_path = None
+        simulator.checkpoint_interval = None
+        simulator.next_checkpoint = None
+        if chain_export_dir is not None:
+            os.makedirs(chain_export_dir, exist_ok=True)
+        for peer in simulator.network.peers:
+            peer.trace = tracer
+            writer = peer.chain_writer
+            if writer:
+                writer.reopen(os.path.join(chain_export_dir, os.path.basename(writer.path))
+                              if chain_export_dir is not None else None)
+        return simulator
+
+    def reseed(self, seed):
+        """
+        Reseeds all randomness of the run: the random module and the link
+        delays. A checkpoint that is loaded and reseeded continues as a
+        different what-if branch of the same state.
+        """
+        random.seed(seed)
+        self.network.links.reseed(random.getrandbits(64))
+
+    def save_blockchain_archive(self):
+        tree_dir = os.path.join(self.output_dir, "blockchain")
+        os.makedirs(tree_dir, exist_ok=True)
+        archive.write_archive(os.path.join(tree_dir, archive.ARCHIVE_NAME),
+                              self.network.block_store, self.network.peers)
+
     def save_blockchain_trees(self):
-        os.makedirs("blockchain", exist_ok=True)
+        tree_dir = os.path.join(self.output_dir, "blockchain")
+        os.makedirs(tree_dir, exist_ok=True)
+        parent = self.network.block_store.parent
         for peer in self.network.peers:
-            with open(f'blockchain/peer_{peer.peer_id}.txt', 'w') as f:
-                for blk_id, data in peer.block_tree.items():
-                    f.write(f"{blk_id}|{data['parent']}|{data['arrival_time']}\n")
+            arrival_time = peer.block_view.arrival_time
+            with open(os.path.join(tree_dir, f'peer_{peer.peer_id}.txt'), 'w') as f:
+                for block_id in peer.block_view:
+                    parent_id = parent[block_id] if parent[block_id] != -1 else None
+                    f.write(f"{format_block_id(block_id)}|{format_block_id(parent_id)}|{arrival_time[block_id]}\n")
     
 
-    def generate_statistics_table(self):
+    def statistics_rows(self):
         data = []
         blocks_in_longest_chain = self.get_longest_chain_blocks()  # Get blocks mined in longest chain per peer
 
@@ -49,27 +232,25 @@ class Simulator:
 
             data.append([node_id, hashing_power, speed, total_blocks_mined, total_blocks_in_longest_chain, ratio])
 
-        df = pd.DataFrame(data, columns=[
-            "Node No", "Hashing Power", "Speed", "Blocks Mined", "Blocks in Longest Chain", "Ratio"])
+        return data
+
+    def generate_statistics_table(self, verbose=True, rows=None):
+        df = report.statistics_table(rows if rows is not None else self.statistics_rows())
 
-        print("\nSimulation Results:")
-        print(df.to_string(index=False))
-        df.to_csv("simulation_results.csv", index=False)
+        if verbose:
+            print("\nSimulation Results:")
+            print(df.to_string(index=False))
+        df.to_csv(os.path.join(self.output_dir, "simulation_results.csv"), index=False)
+        return df
 
     def get_longest_chain_blocks(self):
         blocks_created_by_peer = defaultdict(int)
-        current_block = self.network.peers[0].longest_chain_tip 
+        block_store = self.network.block_store
+        tip = self.network.peers[0].longest_chain_tip.id
 
-        while current_block and current_block.miner_id != "GENESIS":
-            miner_id = current_block.miner_id  
-            blocks_created_by_peer[miner_id] += 1 
+        for block_id in block_store.chain(tip, GENESIS_ID):
+            blocks_created_by_peer[block_store.miner[block_id]] += 1
 
-            parent_id = self.network.peers[0].block_tree[current_block.id]['parent']  
-            if parent_id:
-                current_block = self.network.peers[0].block_tree[parent_id]['block']  
-            else:
-                break  
-            
-        return dict(blocks_created_by_peer) 
+        return dict(blocks_created_by_peer)
 
 
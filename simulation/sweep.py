@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import random
+from . import report
+from .network import Network
+from .simulator import Simulator
+from .transaction import Transaction
+
+PARAMETERS = ("n", "z0", "z1", "Ttx", "I")
+
+
+def expand_grid(grid, seeds):
+    """
+    Returns one configuration dict per combination of the values in grid
+    (a dict mapping each name in PARAMETERS to a list of values) and seed.
+    """
+    values = [grid[name] for name in PARAMETERS]
+    return [dict(zip(PARAMETERS, combination), seed=seed)
+            for combination in itertools.product(*values)
+            for seed in seeds]
+
+
+def run_name(config):
+    return "_".join(f"{name}{config[name]}" for name in PARAMETERS + ("seed",))
+
+
+def run_config(config, output_root, max_time, headless=False):
+    """
+    Runs one configuration in its own output directory and returns its
+    statistics rows with the configuration values prepended.
+    """
+    output_dir = os.path.join(output_root, run_name(config))
+    os.makedirs(output_dir, exist_ok=True)
+
+    random.seed(config["seed"])
+    Transaction.reset_ids()
+
+    network = Network(config["n"], config["z0"], config["z1"], config["I"], topology_seed=config["seed"])
+    simulator = Simulator(network, config["Ttx"], config["I"], max_time, output_dir=output_dir)
+    simulator.initialize_events()
+    rows = simulator.run(verbose=False, headless=headless)
+
+    values = list(config.values())
+    return [values + row for row in rows]
+
+
+def run_sweep(grid, seeds, output_root, max_time, workers=None, headless=False):
+    """
+    Runs every configuration of the grid for every seed across a process
+    pool, and merges the per-run statistics into output_root/results.csv.
+    Headless runs skip the per-run topology plots and pandas tables.
+    """
+    os.makedirs(output_root, exist_ok=True)
+    configs = expand_grid(grid, seeds)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tables = list(pool.map(run_config, configs, itertools.repeat(output_root),
+                               itertools.repeat(max_time), itertools.repeat(headless)))
+
+    columns = list(PARAMETERS) + ["seed"] + report.COLUMNS
+    results = report.statistics_table([row for rows in tables for row in rows], columns)
+    results.to_csv(os.path.join(output_root, "results.csv"), index=False)
+    return results
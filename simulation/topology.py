@@ -0,0 +1,135 @@
+from collections import deque
+import os
+import random
+
+MIN_DEGREE = 3
+MAX_DEGREE = 6
+
+_cache = {}  # (n, min_degree, max_degree, seed) -> edge list
+
+
+def random_topology(n, rng, min_degree=MIN_DEGREE, max_degree=MAX_DEGREE):
+    """
+    Returns the edges of a random connected graph on n nodes in which every
+    node gets a target degree between min_degree and max_degree. Runs in
+    O(E): a random spanning tree makes the graph connected, the remaining
+    degree is filled by random stub matching, and nodes still below
+    min_degree are then repaired.
+    """
+    target = [rng.randint(min_degree, max_degree) for _ in range(n)]
+    adjacency = [set() for _ in range(n)]
+    edges = []
+
+    def connect(u, v):
+        adjacency[u].add(v)
+        adjacency[v].add(u)
+        edges.append((u, v))
+
+    # Random spanning tree: attach every node to a node already in the tree
+    order = list(range(n))
+    rng.shuffle(order)
+    attachable = order[:1]  # Tree nodes below their target degree
+    for node in order[1:]:
+        i = rng.randrange(len(attachable))
+        parent = attachable[i]
+        connect(node, parent)
+        if len(adjacency[parent]) >= target[parent]:
+            attachable[i] = attachable[-1]
+            attachable.pop()
+        attachable.append(node)
+
+    # Stub matching; self-loops and duplicate edges are dropped
+    stubs = [node for node in range(n) for _ in range(target[node] - len(adjacency[node]))]
+    rng.shuffle(stubs)
+    for i in range(0, len(stubs) - 1, 2):
+        u, v = stubs[i], stubs[i + 1]
+        if u != v and v not in adjacency[u]:
+            connect(u, v)
+
+    # Repair nodes below min_degree with nodes that still have room
+    spare = [node for node in range(n) if len(adjacency[node]) < max_degree]
+    for node in range(n):
+        while len(adjacency[node]) < min_degree:
+            neighbor = _pick_spare(node, spare, adjacency, max_degree, rng)
+            if neighbor is None:
+                break
+            connect(node, neighbor)
+
+    return edges
+
+
+def _pick_spare(node, spare, adjacency, max_degree, rng):
+    def usable(candidate):
+        return (candidate != node and candidate not in adjacency[node]
+                and len(adjacency[candidate]) < max_degree)
+
+    for _ in range(32):
+        if not spare:
+            return None
+        candidate = spare[rng.randrange(len(spare))]
+        if usable(candidate):
+            return candidate
+
+    # Unlucky or nearly full graph: drop full nodes and scan the rest
+    spare[:] = [candidate for candidate in spare if len(adjacency[candidate]) < max_degree]
+    candidates = [candidate for candidate in spare if usable(candidate)]
+    return rng.choice(candidates) if candidates else None
+
+
+def load_topology(n, seed=None, cache_dir=None, min_degree=MIN_DEGREE, max_degree=MAX_DEGREE):
+    """
+    Returns the edges of the random topology for n nodes. With a seed the
+    topology is reproducible and cached in memory, and on disk under
+    cache_dir if given. Without a seed the global RNG is used.
+    """
+    if seed is None:
+        return random_topology(n, random, min_degree, max_degree)
+
+    key = (n, min_degree, max_degree, seed)
+    if key in _cache:
+        return _cache[key]
+
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"topology_n{n}_d{min_degree}-{max_degree}_seed{seed}.txt")
+        if os.path.exists(path):
+            with open(path) as f:
+                edges = [tuple(map(int, line.split())) for line in f]
+            _cache[key] = edges
+            return edges
+
+    edges = random_topology(n, random.Random(seed), min_degree, max_degree)
+    _cache[key] = edges
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, 'w') as f:
+            f.writelines(f"{u} {v}\n" for u, v in edges)
+    return edges
+
+
+def approximate_diameter(adjacency, sweeps=4, rng=None):
+    """
+    Lower bound on the diameter from repeated double-sweep BFS, which is
+    exact on trees and usually exact or off by one on sparse random graphs.
+    """
+    rng = rng or random.Random(0)
+
+    def farthest(source):
+        distance = {source: 0}
+        queue = deque([source])
+        node = source
+        while queue:
+            node = queue.popleft()
+            for neighbor in adjacency[node]:
+                if neighbor not in distance:
+                    distance[neighbor] = distance[node] + 1
+                    queue.append(neighbor)
+        return node, distance[node]
+
+    best = 0
+    for _ in range(sweeps):
+        far, _ = farthest(rng.randrange(len(adjacency)))
+        _, eccentricity = farthest(far)
+        best = max(best, eccentricity)
+    return best
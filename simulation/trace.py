@@ -0,0 +1,146 @@
+import csv
+import queue
+import struct
+import sys
+import threading
+
+# Verbosity levels
+OFF = 0
+BLOCKS = 1
+TRANSACTIONS = 2
+LEVELS = {'off': OFF, 'blocks': BLOCKS, 'txns': TRANSACTIONS}
+
+# Record types. Every record is (time, type, peer_id, item_id, arg1, arg2):
+#   BLOCK_MINED:   item_id = block ID, arg1 = parent ID, arg2 = number of transactions
+#   TXN_GENERATED: item_id = transaction ID, arg1 = recipient, arg2 = amount
+BLOCK_MINED = 0
+TXN_GENERATED = 1
+
+FIELDS = ("time", "event", "peer", "id", "arg1", "arg2")
+RECORD = struct.Struct('<dBiqqq')
+
+
+class TextSink:
+    """
+    Writes records as human-readable lines, by default to stdout.
+    """
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, records):
+        lines = []
+        for time, kind, peer_id, item_id, arg1, arg2 in records:
+            if kind == TXN_GENERATED:
+                lines.append(f"Time {time:.2f}: Peer {peer_id} generated "
+                             f"TxnID:{item_id:08x} => {peer_id} pays {arg1} {arg2} coins\n")
+            else:
+                lines.append(f"Block mined by peer {peer_id} at time {time}s\n")
+        self.stream.write(''.join(lines))
+
+    def close(self):
+        self.stream.flush()
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(FIELDS)
+
+    def write(self, records):
+        self.writer.writerows(records)
+
+    def close(self):
+        self.file.close()
+
+
+class BinarySink:
+    """
+    Writes records as fixed-size little-endian structs (see RECORD).
+    """
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+
+    def write(self, records):
+        pack = RECORD.pack
+        self.file.write(b''.join(pack(*record) for record in records))
+
+    def close(self):
+        self.file.close()
+
+
+def read_binary_trace(path):
+    with open(path, 'rb') as f:
+        return list(RECORD.iter_unpack(f.read()))
+
+
+class Tracer:
+    """
+    Collects trace records up to the configured level and hands them in
+    chunks to a background thread that writes them to the sink. Callers
+    check the level before building a record, so a disabled tracer costs
+    a single comparison.
+    """
+    def __init__(self, sink, level=TRANSACTIONS, chunk_size=8192):
+        self.level = level
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.buffer = []
+
+        self.chunks = queue.Queue(maxsize=64)
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+    def record(self, time, kind, peer_id, item_id, arg1=0, arg2=0):
+        self.buffer.append((time, kind, peer_id, item_id, arg1, arg2))
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.chunks.put(self.buffer)
+            self.buffer = []
+
+    def write_chunks(self):
+        while (chunk := self.chunks.get()) is not None:
+            self.sink.write(chunk)
+
+    def close(self):
+        self.flush()
+        self.chunks.put(None)
+        self.writer.join()
+        self.sink.close()
+        self.level = OFF
+
+
+class NullTracer:
+    level = OFF
+
+    def record(self, *args):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def make_tracer(sink, level, path=None):
+    """
+    Builds a tracer from command line options. sink is one of 'stdout',
+    'csv', 'binary' or 'none', and level one of the keys of LEVELS.
+    """
+    level = LEVELS[level]
+    if sink == 'none' or level == OFF:
+        return NULL_TRACER
+    if sink == 'stdout':
+        return Tracer(TextSink(), level)
+    if sink == 'csv':
+        return Tracer(CsvSink(path or 'trace.csv'), level)
+    if sink == 'binary':
+        return Tracer(BinarySink(path or 'trace.bin'), level)
+    raise ValueError(f"Unknown trace sink: {sink}")
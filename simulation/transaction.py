@@ -1,14 +1,21 @@
-import uuid
-
 class Transaction:
-    def __init__(self, sender_id, recipient_id, amount, coinbase=False):
-        self.txn_id = str(uuid.uuid4())
+    __slots__ = ('txn_id', 'sender_id', 'recipient_id', 'amount', 'coinbase', 'timestamp')
+
+    size = 1024  # 1 KB
+    next_id = 0  # IDs are allocated in creation order
+
+    def __init__(self, sender_id, recipient_id, amount, coinbase=False, timestamp=0.0):
+        self.txn_id = Transaction.next_id
+        Transaction.next_id += 1
         self.sender_id = sender_id
         self.recipient_id = recipient_id
         self.amount = amount
         self.coinbase = coinbase
-        self.size = 1024  # 1 KB
+        self.timestamp = timestamp  # Simulated time the transaction was created
+
+    @classmethod
+    def reset_ids(cls, start=0):
+        cls.next_id = start
 
     def __str__(self):
-        return f"TxnID:{self.txn_id[:8]} => {self.sender_id} pays {self.recipient_id} {self.amount} coins"
-    
\ No newline at end of file
+        return f"TxnID:{self.txn_id:08x} => {self.sender_id} pays {self.recipient_id} {self.amount} coins"
@@ -0,0 +1,165 @@
+import heapq
+import numpy as np
+from .archive import chain_mask, load_archive
+
+# Renders the block tree of one peer from a block tree archive. The x axis is
+# the block height and the peer's longest chain is the horizontal line at y = 0.
+# Every fork is drawn as a branch on its own lane, connected to the chain or to
+# the branch it forks off. Unforked runs of the chain longer than max_run are
+# collapsed to a fixed width and labelled with their length, and all lines are
+# drawn in two LineCollections, so large trees render in one pass.
+
+MAX_LABELS = 50
+
+
+def block_tree(archive_path, peer_id=0):
+    """
+    Loads what the renderer needs from an archive: the parent and depth of
+    every block, which of them the peer has seen and the peer's tip.
+    """
+    archive = load_archive(archive_path, mmap_mode='r')
+    seen = ~np.isnan(archive['arrival'][peer_id])
+    return np.array(archive['parent']), np.array(archive['depth']), seen, int(archive['tip'][peer_id])
+
+
+def fork_branches(parent, seen, on_main):
+    """
+    Splits the seen blocks off the main chain into branches, runs of blocks
+    that each extend the previous one. Returns a list of
+    [fork point, first block, last block] by block ID.
+    """
+    branches = []
+    branch_of = {}  # block -> its branch, while the branch can still be extended
+    for block in np.flatnonzero(seen & ~on_main).tolist():
+        # A branch's blocks are visited in chain order, as IDs follow mining order (see archive)
+        branch = branch_of.pop(int(parent[block]), None)
+        if branch is None:
+            branch = [int(parent[block]), block, block]
+            branches.append(branch)
+        branch[2] = block
+        branch_of[block] = branch
+    return branches
+
+
+def assign_lanes(spans):
+    """
+    Packs (start, end) height spans into as few lanes as possible; lanes
+    alternate above and below the main chain. Returns one lane per span.
+    """
+    lanes = [0] * len(spans)
+    free = []  # (end height, lane) of the branch last drawn on each lane
+    num_lanes = 0
+    for index in sorted(range(len(spans)), key=lambda i: spans[i][0]):
+        start, end = spans[index]
+        # Leave a height of space between two branches on one lane
+        if free and free[0][0] < start - 1:
+            _, lane = heapq.heappop(free)
+        else:
+            lane = (num_lanes // 2 + 1) * (1 if num_lanes % 2 == 0 else -1)
+            num_lanes += 1
+        lanes[index] = lane
+        heapq.heappush(free, (end, lane))
+    return lanes
+
+
+def render_block_tree(archive_path, output="block_tree.png", peer_id=0, heights=None, max_run=20):
+    """
+    Draws the block tree of peer_id, restricted to heights (first, last) if
+    given, and saves it to output.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    parent, depth, seen, tip = block_tree(archive_path, peer_id)
+    lowest, highest = heights if heights else (0, int(depth[seen].max()))
+
+    on_main = chain_mask(parent, tip)
+
+    branches = [branch for branch in fork_branches(parent, seen, on_main)
+                if depth[branch[1]] <= highest and depth[branch[2]] >= lowest]
+    spans = [(int(depth[first]), int(depth[last])) for _, first, last in branches]
+    lanes = assign_lanes(spans)
+
+    # Heights where something happens; the runs between them are compressed to at most max_run
+    fork_heights = [int(depth[fork_point]) for fork_point, _, _ in branches]
+    marks = np.unique(np.clip([lowest, highest] + fork_heights + [h for span in spans for h in span],
+                              lowest, highest))
+    widths = np.minimum(np.diff(marks), max_run)
+    mark_x = np.concatenate(([0], np.cumsum(widths)))
+
+    def x(height):
+        return np.interp(height, marks, mark_x)
+
+    # The chain between consecutive marks, as an array of ((x, 0), (x, 0)) segments
+    chain = np.zeros((len(widths), 2, 2))
+    chain[:, 0, 0], chain[:, 1, 0] = mark_x[:-1], mark_x[1:]
+    is_collapsed = np.diff(marks) > max_run
+    solid, collapsed = list(chain[~is_collapsed]), chain[is_collapsed]
+
+    # Lane of every block drawn on a branch, to start the branches that fork off it there
+    lane_of = {}
+    for (_, first, last), lane in zip(branches, lanes):
+        block = last
+        while block != first:
+            lane_of[block] = lane
+            block = int(parent[block])
+        lane_of[first] = lane
+
+    fork_points, branch_points = [], []
+    for (fork_point, first, last), (start, end), lane in zip(branches, spans, lanes):
+        start, end = max(start, lowest), min(end, highest)
+        if depth[fork_point] >= lowest:
+            fork = (x(depth[fork_point]), lane_of[fork_point] if not on_main[fork_point] else 0)
+            solid.append([fork, (x(start), lane)])
+            fork_points.append(fork)
+        solid.append([(x(start), lane), (x(end), lane)])
+        branch_points.append((x(end), lane))
+
+    fig, ax = plt.subplots(figsize=(max(8, min(40, mark_x[-1] / 10)), max(3, 1 + len(set(lanes)) * 0.5)))
+    ax.add_collection(LineCollection(solid, colors='black', linewidths=1))
+    ax.add_collection(LineCollection(collapsed, colors='gray', linewidths=1, linestyles='dashed'))
+    # Labels are only readable, and cheap to draw, when there are few of them
+    if is_collapsed.sum() <= MAX_LABELS:
+        for start, end in zip(marks[:-1][is_collapsed], marks[1:][is_collapsed]):
+            ax.annotate(f"{end - start} blocks", ((x(start) + x(end)) / 2, 0), textcoords="offset points",
+                        xytext=(0, 4), ha='center', fontsize=7, color='gray')
+
+    if fork_points:
+        ax.scatter(*zip(*fork_points), s=12, color='red', zorder=3, label='fork point')
+    if branch_points:
+        ax.scatter(*zip(*branch_points), s=12, color='blue', zorder=3, label='branch tip')
+
+    ax.set_xlim(-1, mark_x[-1] + 1)
+    ax.set_ylim(min(lanes + [0]) - 1, max(lanes + [0]) + 1)
+    # Label the heights of about 20 marks, spread out so that the labels do not overlap
+    ticks, last_x = [], -np.inf
+    for height, mark in zip(marks.tolist(), mark_x.tolist()):
+        if mark - last_x >= mark_x[-1] / 20:
+            ticks.append(height)
+            last_x = mark
+    ax.set_xticks(x(ticks), [str(tick) for tick in ticks], fontsize=7, rotation=45)
+    ax.set_yticks([])
+    ax.set_xlabel("Height")
+    ax.set_title(f"Block tree of peer {peer_id}, heights {lowest} to {highest}: "
+                 f"{len(branches)} fork branch(es)")
+    if branches:
+        ax.legend(loc='upper left', fontsize=7)
+    fig.tight_layout()
+    fig.savefig(output)
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Render the block tree of a peer from a block tree archive')
+    parser.add_argument('archive', nargs='?', default="blockchain/blocks.npz", help='Block tree archive')
+    parser.add_argument('--peer', type=int, default=0, help='Peer whose block tree is drawn')
+    parser.add_argument('--heights', type=int, nargs=2, default=None, metavar=('FIRST', 'LAST'),
+                        help='Only draw the blocks of these heights')
+    parser.add_argument('--max-run', type=int, default=20,
+                        help='Unforked runs of the chain longer than this are collapsed')
+    parser.add_argument('--output', default="block_tree.png", help='Image file to write')
+    args = parser.parse_args()
+
+    render_block_tree(args.archive, args.output, args.peer, args.heights, args.max_run)
@@ -0,0 +1,25 @@
+class ValidationCache:
+    """
+    Block validation results shared by all peers, keyed by block ID. Whether
+    a block is valid, and the balance changes it makes, depend only on the
+    block and its ancestors, which are the same for every peer, so each
+    block only needs to be checked once for the whole network.
+    """
+    def __init__(self):
+        self.results = {}  # block_id -> (is_valid, delta or None)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def get(self, block_id):
+        result = self.results.get(block_id)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, block_id, is_valid, delta):
+        self.results[block_id] = (is_valid, delta)
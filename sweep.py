@@ -0,0 +1,30 @@
+import argparse
+import time
+from simulation.sweep import expand_grid, run_sweep
+
+def main():
+    start_time = time.time()
+
+    parser = argparse.ArgumentParser(description='Run the simulator over a grid of parameters in parallel')
+    parser.add_argument('--n', type=int, nargs='+', default=[50], help='Numbers of peers')
+    parser.add_argument('--z0', type=float, nargs='+', default=[0], help='Percentages of slow nodes')
+    parser.add_argument('--z1', type=float, nargs='+', default=[0], help='Percentages of low CPU nodes')
+    parser.add_argument('--Ttx', type=float, nargs='+', default=[100], help='Mean transaction interarrival times')
+    parser.add_argument('--I', type=float, nargs='+', default=[600], help='Mean block interarrival times')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0], help='Random seeds, one run per seed')
+    parser.add_argument('--max-time', type=float, default=200000, help='Simulated time of each run')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--output', default='sweep_results', help='Directory for the per-run outputs')
+    parser.add_argument('--headless', action='store_true', help='Skip the per-run topology plots')
+    args = parser.parse_args()
+
+    grid = {'n': args.n, 'z0': args.z0, 'z1': args.z1, 'Ttx': args.Ttx, 'I': args.I}
+    run_sweep(grid, args.seeds, args.output, args.max_time, args.workers, args.headless)
+
+    num_runs = len(expand_grid(grid, args.seeds))
+    print(f"Completed {num_runs} runs, results in {args.output}/results.csv")
+    print(f"Total Sweep Time: {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import itertools
+import numpy as np
+from simulation.archive import canonical_tip, chain_mask, load_archive
+
 def parse_transaction(line):
     """
     Given a transaction line of the form:
@@ -101,8 +107,152 @@ def process_block(transactions, miner, balances, errors):
             balances[sender] = sender_balance - amount
             balances[recipient] = balances.get(recipient, 0) + amount
 
-if __name__ == '__main__':
-    file_name = "peer0_transactions.txt"
+# --------------------------------------------------------
+# Verification of every peer's chain from the block tree archive
+# --------------------------------------------------------
+
+def chain_blocks(parent, tip):
+    """
+    Returns the IDs of the blocks on the chain ending at tip, oldest first,
+    without the genesis block.
+    """
+    # Block IDs grow along a chain, so the chain's IDs in order are its blocks in order
+    return np.flatnonzero(chain_mask(parent, tip))[1:].astype(np.int64)
+
+def verify_chain(archive_path, tip):
+    """
+    Verifies the chain ending at tip with array operations over the whole
+    chain instead of a loop over its transactions. Checks the same rules as
+    verify_transactions, plus that no transaction is included twice.
+    Returns a tuple (tip, errors, final_balances as an array by account).
+
+    Transactions are all applied, so only the first overdraft of each
+    sender is reported, and after it the final balances can differ from
+    those of verify_transactions, which skips invalid transactions.
+    """
+    archive = load_archive(archive_path, mmap_mode='r')
+    blocks = chain_blocks(archive['parent'].tolist(), tip)
+    num_accounts = len(archive['tip'])
+    errors = []
+    if len(blocks) == 0:
+        # A peer still on the genesis block has nothing to verify
+        return tip, errors, np.zeros(num_accounts, dtype=np.int64)
+
+    # Rows of the chain's transactions in the transaction table
+    offsets = archive['txn_offset']
+    starts, counts = offsets[blocks], offsets[blocks + 1] - offsets[blocks]
+    first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rows = np.repeat(starts - first, counts) + np.arange(counts.sum())
+
+    txn_id = archive['txn_id'][rows]
+    sender = archive['sender'][rows]
+    recipient = archive['recipient'][rows]
+    amount = archive['amount'][rows]
+    coinbase = archive['coinbase'][rows]
+
+    for block_id in blocks[counts == 0]:
+        errors.append(f"Block {block_id:08x} has no transactions.")
+
+    # The first transaction of every block pays 50 coins to its miner, and no other is a coinbase
+    blocks, first = blocks[counts > 0], first[counts > 0]
+    miners = archive['miner'][blocks]
+    valid_coinbase = (coinbase[first] & (sender[first] == miners) & (recipient[first] == miners)
+                      & (amount[first] == 50))
+    for block_id, miner in zip(blocks[~valid_coinbase], miners[~valid_coinbase]):
+        errors.append(f"Invalid coinbase transaction in block {block_id:08x} by miner {miner}")
+    is_first = np.zeros(len(rows), dtype=bool)
+    is_first[first] = True
+    for position in np.flatnonzero(coinbase & ~is_first):
+        errors.append(f"Coinbase transaction {txn_id[position]:08x} is not the first of its block.")
+
+    unique_ids, id_counts = np.unique(txn_id, return_counts=True)
+    for duplicate in unique_ids[id_counts > 1]:
+        errors.append(f"Transaction {duplicate:08x} is included more than once.")
+
+    # Running balance of every account, with each payment debited just before it is credited
+    position = np.arange(len(rows))
+    debit = ~coinbase
+    accounts = np.concatenate((sender[debit], recipient))
+    order = np.concatenate((2 * position[debit], 2 * position + 1))
+    change = np.concatenate((-amount[debit], amount))
+
+    by_account = np.lexsort((order, accounts))
+    accounts, order, change = accounts[by_account], order[by_account], change[by_account]
+    if len(accounts) == 0:
+        # Only blocks without transactions, which are reported above
+        return tip, errors, np.zeros(num_accounts, dtype=np.int64)
+    running = np.cumsum(change)
+    group_start = np.flatnonzero(np.r_[True, accounts[1:] != accounts[:-1]])
+    running -= np.repeat(running[group_start] - change[group_start], np.diff(np.r_[group_start, len(accounts)]))
+
+    # Only the first overdraft of each sender is exact, as later balances include the invalid payment
+    overdraft = (running < 0) & (change < 0)
+    _, first_overdraft = np.unique(accounts[overdraft], return_index=True)
+    for position in np.sort(order[overdraft][first_overdraft] // 2):
+        errors.append(f"Insufficient balance for transaction {txn_id[position]:08x}: sender {sender[position]} "
+                      f"tries to send {amount[position]} coins (later payments of this sender are not checked).")
+
+    final_balances = np.bincount(accounts, weights=change, minlength=num_accounts).astype(np.int64)
+    return tip, errors, final_balances
+
+def common_ancestor(parent, depth, a, b):
+    while depth[a] > depth[b]:
+        a = parent[a]
+    while depth[b] > depth[a]:
+        b = parent[b]
+    while a != b:
+        a, b = parent[a], parent[b]
+    return a
+
+def chain_divergence(parent, depth, tips):
+    """
+    Compares the chains ending at the given tips (one per peer). Returns the
+    height of the prefix all of them share, and for every distinct tip a
+    tuple (tip, number of peers on it, height, height at which it forks
+    off the longest chain).
+    """
+    distinct, peer_counts = np.unique(tips, return_counts=True)
+    distinct, peer_counts = distinct.tolist(), peer_counts.tolist()
+    main = canonical_tip(np.asarray(depth), tips)
+
+    branches = []
+    for tip, count in zip(distinct, peer_counts):
+        fork_height = depth[common_ancestor(parent, depth, tip, main)]
+        branches.append((tip, count, depth[tip], fork_height))
+    common_prefix = min(fork_height for _, _, _, fork_height in branches)
+    return common_prefix, branches
+
+def verify_archive(archive_path, workers=None):
+    """
+    Verifies the longest chain of every peer in a block tree archive. Peers
+    on the same tip share their chain, so each distinct tip is verified
+    once, in parallel across processes. Returns a tuple
+    (results by tip as (errors, final_balances), common prefix height,
+    branches as returned by chain_divergence).
+    """
+    archive = load_archive(archive_path, mmap_mode='r')
+    parent, depth = archive['parent'].tolist(), archive['depth'].tolist()
+    common_prefix, branches = chain_divergence(parent, depth, archive['tip'])
+
+    tips = [tip for tip, _, _, _ in branches]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = {tip: (errors, balances)
+                   for tip, errors, balances in pool.map(verify_chain, itertools.repeat(archive_path), tips)}
+    return results, common_prefix, branches
+
+def print_archive_report(archive_path, workers=None):
+    results, common_prefix, branches = verify_archive(archive_path, workers)
+
+    print(f"{len(branches)} distinct tip(s); all peers share the first {common_prefix} blocks.")
+    for tip, count, height, fork_height in sorted(branches, key=lambda branch: -branch[1]):
+        errors, balances = results[tip]
+        fork = "" if height == fork_height else f", forks off the longest chain at height {fork_height}"
+        print(f"  Tip {tip:08x}: {count} peer(s), height {height}{fork}, "
+              f"{len(errors)} error(s), total coins {balances.sum()}")
+        for err in errors:
+            print("    -", err)
+
+def print_text_report(file_name):
     errors, final_balances = verify_transactions(file_name)
     if errors:
         print("Errors found during verification:")
@@ -116,4 +266,18 @@ if __name__ == '__main__':
         total_balance+=balance
         print(f"  Account {account}: {balance} coins")
 
-    print(f"Total coins: {total_balance}")
\ No newline at end of file
+    print(f"Total coins: {total_balance}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verify the transactions of the longest chain')
+    parser.add_argument('--archive', default=None,
+                        help='Verify every peer\'s chain from this block tree archive (blockchain/blocks.npz)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('file', nargs='?', default="peer0_transactions.txt",
+                        help='Transaction export of a single peer, used without --archive')
+    args = parser.parse_args()
+
+    if args.archive:
+        print_archive_report(args.archive, args.workers)
+    else:
+        print_text_report(args.file)
\ No newline at end of file